@@ -12,8 +12,9 @@
 # SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 from .settings import get_settings
 import os
 
@@ -33,5 +34,36 @@ else:
     DATABASE_URL = f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # --- Create engine and session ---
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+def engine_options(settings) -> dict:
+    if settings.DB_PGBOUNCER:
+        # pgbouncer owns pooling; prepare_threshold=None stops psycopg from preparing statements,
+        # which break when consecutive transactions land on different server connections
+        return {"poolclass": NullPool, "connect_args": {"prepare_threshold": None}}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(DATABASE_URL, **engine_options(settings))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"class": type(pool).__name__}
+    return {
+        "class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+
+def ping() -> None:
+    """Raises if the database is unreachable."""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
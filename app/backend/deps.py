@@ -1,16 +1,60 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from uuid import UUID
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from jose import JWTError
 
 from .database import SessionLocal
 from .security import decode_token
 from .models import User
+from .settings import get_settings
+from .utils.cache import TTLCache
 
 # Correct OAuth2 config (no leading slash)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """Detached snapshot of the authenticated user; safe to cache and share across requests."""
+    id: UUID
+    email: str
+    name: str
+    provider: str
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(id=user.id, email=user.email, name=user.name, provider=user.provider, created_at=user.created_at)
+
+
+# Validated token -> CurrentUser, so authenticated requests skip the JWT decode and the user query.
+# Entries never outlive the token's own expiry; user changes made through the ORM evict them.
+# The cached value carries the user id, so eviction scans the (bounded) cache instead of keeping
+# a token index per user that TTL/LRU expiry would never clean up.
+_settings = get_settings()
+_user_cache = TTLCache(_settings.AUTH_CACHE_MAX_ENTRIES, _settings.AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: UUID) -> None:
+    _user_cache.delete_where(lambda user: user.id == user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _on_user_change(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+
+
+def user_cache_stats() -> dict:
+    return _user_cache.stats()
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -22,7 +66,11 @@ def get_db():
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
+) -> CurrentUser:
+    cached = _user_cache.get(token)
+    if cached is not None:
+        return cached
+
     # Validate JWT
     try:
         payload = decode_token(token)
@@ -47,7 +95,11 @@ def get_current_user(
             detail="User not found",
         )
 
-    return user
+    current = CurrentUser.from_user(user)
+    ttl = min(_settings.AUTH_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        _user_cache.set(token, current, ttl_seconds=ttl)
+    return current
 
 
 
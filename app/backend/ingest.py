@@ -0,0 +1,244 @@
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Document, DocumentBlob, Message
+from .settings import get_settings
+from .utils.file_extract import extract_document_from_path, extract_pdf_parallel
+from .utils.retrieval import add_document_chunks
+from .versioning import bump_for_document
+
+# Uploads are written to UPLOAD_DIR and acknowledged immediately. A small coordinator thread
+# pool drives each job and records its status/progress on the Document row, while the
+# CPU-bound extraction itself runs in a process pool so it never holds the GIL of the
+# API process.
+#
+# A job is claimed by moving it from "pending" to "processing"; the claiming worker renews
+# Document.heartbeat_at while it works, so only jobs whose worker has died are taken over
+# (see resume_pending, reclaim_expired). Uploads are spooled to the local UPLOAD_DIR, so a job is
+# only ever resumed on the host recorded in Document.upload_host.
+
+_lock = threading.Lock()
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_coordinator: Optional[ThreadPoolExecutor] = None
+_stopping = False
+
+
+def host() -> str:
+    return get_settings().INGEST_HOST or socket.gethostname()
+
+
+def extract_processes() -> int:
+    # By default each API worker process takes its share of the cores, not all of them
+    settings = get_settings()
+    return settings.EXTRACT_PROCESSES or max(1, (os.cpu_count() or 1) // settings.WEB_CONCURRENCY)
+
+
+def _pools() -> tuple[ProcessPoolExecutor, ThreadPoolExecutor]:
+    global _extract_pool, _coordinator
+    with _lock:
+        if _stopping:
+            raise CancelledError("ingestion is shutting down")
+        if _extract_pool is None:
+            settings = get_settings()
+            # spawn: forking a process that holds DB connections and threads is not safe
+            _extract_pool = ProcessPoolExecutor(max_workers=extract_processes(), mp_context=get_context("spawn"))
+            _coordinator = ThreadPoolExecutor(max_workers=settings.INGEST_WORKERS, thread_name_prefix="ingest")
+        return _extract_pool, _coordinator
+
+
+def upload_path(document_id: UUID, filename: str) -> str:
+    upload_dir = get_settings().UPLOAD_DIR
+    os.makedirs(upload_dir, exist_ok=True)
+    return os.path.join(upload_dir, f"{document_id}{os.path.splitext(filename)[1].lower()}")
+
+
+def _remove(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def sha256_file(fileobj, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(chunk_size), b""):
+        h.update(block)
+    return h.hexdigest()
+
+
+def attach_blob(db: Session, d: Document, blob: DocumentBlob) -> None:
+    """Marks a document ready on top of already extracted text (not committed)."""
+    d.blob_sha256, d.char_count, d.page_count = blob.sha256, blob.char_count, blob.page_count
+    d.status, d.progress, d.error = "ready", 1.0, None
+    db.add(Message(id=uuid4(), session_id=d.session_id, role="assistant", type="upload",
+                   content=f"📄 Document '{d.filename}' uploaded successfully.", created_at=datetime.utcnow()))
+
+
+def submit(document_id: UUID, path: str, filename: str, sha256: str) -> None:
+    _pools()[1].submit(_run, document_id, path, filename, sha256)
+
+
+def _update(document_id: UUID, *criteria, **values) -> int:
+    values.setdefault("heartbeat_at", datetime.utcnow())  # every update renews the lease
+    with SessionLocal() as db:
+        n = db.query(Document).filter(Document.id == document_id, *criteria).update(values, synchronize_session=False)
+        if n and "status" in values:
+            bump_for_document(db, document_id)
+        db.commit()
+        return n
+
+
+def _result(document_id: UUID, future: Future):
+    """Waits for an extraction task, renewing the job's lease meanwhile."""
+    while True:
+        try:
+            return future.result(timeout=get_settings().INGEST_LEASE_SECONDS / 3)
+        except FutureTimeout:
+            _update(document_id, Document.status == "processing")
+
+
+def _extract_pdf(document_id: UUID, path: str) -> tuple[str, list[int], int]:
+    """Fans page ranges out over the process pool. Their text is spooled to disk in page order as they
+    finish, so the whole text is held in memory once, for storing it, not page by page on top."""
+    settings = get_settings()
+    with tempfile.TemporaryFile("w+", encoding="utf-8", errors="replace", newline="", dir=settings.UPLOAD_DIR) as spool:
+        page_count, offsets = extract_pdf_parallel(
+            _pools()[0], path, spool, settings.PDF_PAGES_PER_TASK, window=2 * extract_processes(),
+            wait=lambda future: _result(document_id, future),
+            on_range=lambda end, total: _update(document_id, progress=0.1 + 0.7 * end / total),
+        )
+        spool.seek(0)
+        return spool.read(), offsets, page_count
+
+
+def _drop_broken_pool() -> None:
+    """Replaces the extraction pool once one of its processes has died (e.g. killed for memory)."""
+    global _extract_pool
+    with _lock:
+        if _extract_pool is None or _stopping:
+            return
+        try:
+            _extract_pool.submit(int).cancel()  # raises on a broken pool
+        except BrokenProcessPool:
+            _extract_pool.shutdown(wait=False)
+            _extract_pool = None
+
+
+def _run(document_id: UUID, path: str, filename: str, sha256: str) -> None:
+    # Claim the job atomically: a job submitted by several workers (see resume_pending) runs once
+    if not _update(document_id, Document.status == "pending", status="processing", progress=0.1):
+        # Whoever holds the job owns its upload, unless the document itself is gone
+        with SessionLocal() as db:
+            if db.query(Document.id).filter(Document.id == document_id).first() is None:
+                _remove(path)
+        return
+    try:
+        _ingest(document_id, path, filename, sha256)
+    except (CancelledError, BrokenProcessPool):
+        # Cancelled by shutdown(), or an extraction process died: not the upload's fault, so the job
+        # goes back to "pending" with its file kept, and is resumed by the next start
+        _update(document_id, Document.status == "processing", status="pending", progress=0.0)
+        _drop_broken_pool()
+        return
+    except Exception as e:
+        _update(document_id, status="failed", error=str(e)[:500] or type(e).__name__)
+    _remove(path)
+
+
+def _ingest(document_id: UUID, path: str, filename: str, sha256: str) -> None:
+    # The same file may have finished extracting for another upload while this one was queued.
+    # No session is kept open across the extraction, which can take minutes.
+    with SessionLocal() as db:
+        extracted = db.query(DocumentBlob.sha256).filter(DocumentBlob.sha256 == sha256).first() is not None
+    if not extracted:
+        page_offsets = None
+        if filename.lower().endswith(".pdf"):
+            content, page_offsets, page_count = _extract_pdf(document_id, path)
+        else:
+            content, page_count = _result(document_id, _pools()[0].submit(extract_document_from_path, path, filename))
+        if not content:
+            _update(document_id, status="failed", error="Could not extract text from file")
+            return
+        _update(document_id, progress=0.8)
+
+    with SessionLocal() as db:
+        if not extracted:
+            # Concurrent uploads of a new file both extract it; the first blob written wins
+            inserted = db.execute(
+                insert(DocumentBlob)
+                .values(sha256=sha256, content=content, char_count=len(content), page_count=page_count,
+                        page_offsets=page_offsets, created_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=["sha256"])
+            ).rowcount
+            if inserted:
+                add_document_chunks(db, content, blob_sha256=sha256)
+            db.flush()
+
+        d = db.get(Document, document_id)
+        if d is None:  # session deleted while processing
+            db.commit()
+            return
+        attach_blob(db, d, db.get(DocumentBlob, sha256))
+        db.commit()
+
+
+def _orphaned():
+    stale = datetime.utcnow() - timedelta(seconds=get_settings().INGEST_LEASE_SECONDS)
+    return and_(Document.status == "processing", or_(Document.heartbeat_at.is_(None), Document.heartbeat_at < stale))
+
+
+def _resume(jobs) -> None:
+    # Only this host's uploads: another replica's files are not on this disk. Rows from before
+    # upload_host was recorded come from a single-host setup.
+    owned = or_(Document.upload_host == host(), Document.upload_host.is_(None))
+    with SessionLocal() as db:
+        rows = db.query(Document.id, Document.filename, Document.status).filter(owned, jobs).all()
+    for r in rows:
+        path = upload_path(r.id, r.filename)
+        if not os.path.exists(path):
+            _update(r.id, jobs, status="failed", error="Upload was interrupted, please upload the file again")
+            continue
+        # Taking over an orphaned job is itself conditional, in case another worker just did
+        if r.status == "processing" and not _update(r.id, _orphaned(), status="pending", progress=0.0):
+            continue
+        try:
+            with open(path, "rb") as f:
+                sha256 = sha256_file(f)
+        except FileNotFoundError:  # finished meanwhile
+            continue
+        submit(r.id, path, r.filename, sha256)
+
+
+def resume_pending() -> None:
+    """Re-queues jobs left behind by a restart: pending ones, and processing ones whose lease has expired.
+    Runs in every API worker; a job still held by a live worker is never touched, and _run's claim makes
+    a pending job submitted by several workers run once. Jobs whose upload file is gone are marked failed."""
+    _resume(or_(Document.status == "pending", _orphaned()))
+
+
+def reclaim_expired() -> None:
+    """Takes over processing jobs whose lease has expired since startup, e.g. those of a worker that
+    crashed and was restarted within one lease period. Run every INGEST_LEASE_SECONDS (see main)."""
+    _resume(_orphaned())
+
+
+def shutdown() -> None:
+    global _stopping
+    with _lock:
+        _stopping = True
+        if _coordinator is not None:
+            _coordinator.shutdown(wait=False, cancel_futures=True)
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=False, cancel_futures=True)
@@ -1,14 +1,19 @@
-import time
-import psycopg2
-from psycopg2 import OperationalError
-import os
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from starlette.concurrency import run_in_threadpool
 from .settings import get_settings
-from .database import engine
-from .models import Base
+from .database import engine, ping, pool_stats
+from . import migrations
 from .routers import auth, sessions
+from .utils.cache import get_response_cache
+from .utils.uploads import UploadSizeLimitMiddleware
+from .deps import user_cache_stats
+from . import ingest, versioning  # versioning registers the Session.version flush hook
 
 
 # -------------------------------------------------------------------
@@ -19,40 +24,86 @@ settings = get_settings()
 # -------------------------------------------------------------------
 # 💡 Wait for the database to be ready (important in Docker)
 # -------------------------------------------------------------------
-def wait_for_db():
-    db_ready = False
-    for attempt in range(10):
+# Probed with the app's own engine after startup instead of blocking import. The schema is
+# built by the separate migration step (python -m backend.migrate); here it is only verified.
+db_ready = asyncio.Event()
+schema = {"current": None, "head": migrations.head()}
+SCHEMA_POLL_SECONDS = 5
+
+def read_schema_version() -> int:
+    with engine.connect() as conn:
+        return migrations.current(conn)
+
+async def wait_for_db():
+    delay = settings.DB_STARTUP_INITIAL_DELAY
+    attempt = 1
+    while True:
         try:
-            conn = psycopg2.connect(
-                dbname=os.getenv("APP_DB_NAME"),
-                user=os.getenv("APP_DB_USER"),
-                password=os.getenv("APP_DB_PASSWORD"),
-                host=os.getenv("APP_DB_HOST"),
-                port=os.getenv("APP_DB_PORT"),
-            )
-            conn.close()
-            db_ready = True
-            print("✅ Database is ready!")
+            await run_in_threadpool(ping)
             break
-        except OperationalError:
-            print(f"⏳ Waiting for database... (attempt {attempt+1}/10)")
-            time.sleep(3)
-    if not db_ready:
-        raise RuntimeError("Database not ready after waiting 30 seconds")
-
-wait_for_db()  # 💡 Call before creating tables
+        except Exception as e:
+            print(f"⏳ Waiting for database... (attempt {attempt}, retry in {delay:.1f}s): {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.DB_STARTUP_MAX_DELAY)
+            attempt += 1
+    print("✅ Database is ready!")
+    schema["current"] = await run_in_threadpool(read_schema_version)
+    db_ready.set()
+    if schema["current"] < schema["head"]:
+        print(f"❌ Database schema is at revision {schema['current']}, this build needs {schema['head']}: "
+              "run `python -m backend.migrate`")
+        # Requests get a 503 (see require_schema) until the migration has run
+        while schema["current"] < schema["head"]:
+            await asyncio.sleep(SCHEMA_POLL_SECONDS)
+            with suppress(Exception):
+                schema["current"] = await run_in_threadpool(read_schema_version)
+        print(f"✅ Database schema is at revision {schema['current']}")
+    await watch_ingest_jobs()
+
+async def watch_ingest_jobs():
+    # Re-queue uploads interrupted by a restart, then keep taking over jobs whose worker stopped
+    # renewing its lease (one that crashed and came back before the lease ran out is only seen here)
+    await run_in_threadpool(ingest.resume_pending)
+    while True:
+        await asyncio.sleep(settings.INGEST_LEASE_SECONDS)
+        try:
+            await run_in_threadpool(ingest.reclaim_expired)
+        except Exception as e:
+            print(f"⚠️ Ingestion lease check failed: {e}")
 
 # -------------------------------------------------------------------
 # 💡 Initialize FastAPI
 # -------------------------------------------------------------------
-app = FastAPI(title=settings.APP_NAME)
-
-# Create tables after DB is confirmed up
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve immediately; /readyz reports 503 until the database answers
+    probe = asyncio.create_task(wait_for_db())
+    yield
+    probe.cancel()
+    with suppress(asyncio.CancelledError):
+        await probe
+    ingest.shutdown()
+
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
+
+# Every model change ships with a migration; on an older schema, queries touching the new columns
+# would fail one by one, so the API refuses up front and says what to do.
+@app.middleware("http")
+async def require_schema(request, call_next):
+    if db_ready.is_set() and schema["current"] < schema["head"] and request.url.path not in ("/", "/readyz", "/metrics"):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Database schema is at revision {schema['current']}, this build needs {schema['head']}"},
+            headers={"Retry-After": str(SCHEMA_POLL_SECONDS)},
+        )
+    return await call_next(request)
 
 # -------------------------------------------------------------------
 # 💡 CORS setup
 # -------------------------------------------------------------------
+# Added before CORS so CORS (outermost) still decorates their 413 / 503 responses
+app.add_middleware(UploadSizeLimitMiddleware)
+
 origins = [o.strip() for o in settings.CORS_ORIGINS.split(",") if o.strip()]
 app.add_middleware(
     CORSMiddleware,
@@ -74,6 +125,26 @@ def root():
     return {"status": "ok", "app": settings.APP_NAME}
 
 
+@app.exception_handler(PoolTimeoutError)
+async def pool_exhausted(request, exc):
+    # No connection freed up within DB_POOL_TIMEOUT: tell clients to back off instead of a 500
+    return JSONResponse(status_code=503, content={"detail": "Server busy, please retry"}, headers={"Retry-After": "1"})
+
+
+@app.get("/readyz")
+def readyz():
+    if not db_ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "starting", "database": False})
+    if schema["current"] < schema["head"]:
+        return JSONResponse(status_code=503, content={"status": "schema_mismatch", "database": True, "schema": schema})
+    return {"status": "ready", "database": True, "schema": schema}
+
+
+@app.get("/metrics")
+def metrics():
+    return {"response_cache": get_response_cache().stats(), "auth_cache": user_cache_stats(), "db_pool": pool_stats()}
+
+
 # -------------------------------------------------------------------
 # 💡 Entry point
 # -------------------------------------------------------------------
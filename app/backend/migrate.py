@@ -0,0 +1,58 @@
+import argparse
+import time
+
+from . import migrations
+from .database import engine, ping
+from .settings import get_settings
+
+# Explicit schema step, run once per deploy before the API workers start:
+#   python -m backend.migrate                 # upgrade to the latest revision
+#   python -m backend.migrate upgrade 3       # ... or to a given one
+#   python -m backend.migrate downgrade 2
+#   python -m backend.migrate current | history
+
+
+def wait_for_db() -> None:
+    settings = get_settings()
+    deadline = time.monotonic() + settings.DB_STARTUP_TIMEOUT_SECONDS
+    delay = settings.DB_STARTUP_INITIAL_DELAY
+    while True:
+        try:
+            ping()
+            return
+        except Exception as e:
+            if time.monotonic() + delay > deadline:
+                raise RuntimeError(f"Database not ready after {settings.DB_STARTUP_TIMEOUT_SECONDS:.0f} seconds") from e
+            print(f"⏳ Waiting for database... (retry in {delay:.1f}s): {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, settings.DB_STARTUP_MAX_DELAY)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.migrate", description="Database schema migrations")
+    sub = parser.add_subparsers(dest="command")
+    up = sub.add_parser("upgrade", help="apply migrations (default: up to the latest)")
+    up.add_argument("revision", nargs="?", type=int)
+    down = sub.add_parser("downgrade", help="revert migrations down to REVISION")
+    down.add_argument("revision", type=int)
+    sub.add_parser("current", help="print the applied revision")
+    sub.add_parser("history", help="list all revisions")
+    args = parser.parse_args()
+
+    if args.command == "history":
+        for m in migrations.load():
+            print(f"{m.revision:04d}  {m.description}")
+        return
+
+    wait_for_db()
+    if args.command == "current":
+        with engine.connect() as conn:
+            print(f"{migrations.current(conn)} (head: {migrations.head()})")
+    elif args.command == "downgrade":
+        print(f"✅ Database schema at revision {migrations.downgrade(engine, args.revision)}")
+    else:
+        print(f"✅ Database schema at revision {migrations.upgrade(engine, getattr(args, 'revision', None))}")
+
+
+if __name__ == "__main__":
+    main()
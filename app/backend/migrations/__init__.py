@@ -0,0 +1,93 @@
+"""Versioned schema migrations.
+
+Each `mNNNN_<name>.py` module in this package defines:
+    revision: int            -- consecutive, starting at 1
+    description: str
+    transactional: bool      -- False for steps that cannot run in a transaction (CREATE INDEX CONCURRENTLY)
+    upgrade(conn) / downgrade(conn)
+
+The applied revision is kept in the one-row `schema_version` table. Run them with
+`python -m backend.migrate`; the API only checks the version at startup.
+"""
+import importlib
+import pkgutil
+from types import ModuleType
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+def load() -> list[ModuleType]:
+    modules = [
+        importlib.import_module(f"{__name__}.{info.name}")
+        for info in pkgutil.iter_modules(__path__)
+        if info.name.startswith("m") and info.name[1:5].isdigit()
+    ]
+    modules.sort(key=lambda m: m.revision)
+    for expected, m in enumerate(modules, start=1):
+        if m.revision != expected:
+            raise RuntimeError(f"Migration revisions must be consecutive: expected {expected}, found {m.revision} ({m.__name__})")
+    return modules
+
+
+def head() -> int:
+    return len(load())
+
+
+def current(conn: Connection) -> int:
+    exists = conn.execute(text("SELECT to_regclass('schema_version') IS NOT NULL")).scalar()
+    if not exists:
+        return 0
+    return conn.execute(text("SELECT version FROM schema_version")).scalar() or 0
+
+
+def _set_version(conn: Connection, version: int) -> None:
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    if conn.execute(text("UPDATE schema_version SET version = :v"), {"v": version}).rowcount == 0:
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
+
+
+def _apply(engine: Engine, migration: ModuleType, step: str, version_after: int) -> None:
+    print(f"{step} {migration.revision:04d}: {migration.description}")
+    if migration.transactional:
+        with engine.begin() as conn:
+            getattr(migration, step)(conn)
+            _set_version(conn, version_after)
+    else:
+        # Each statement commits on its own; steps must be idempotent so a failed run can be retried
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            getattr(migration, step)(conn)
+            _set_version(conn, version_after)
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> int:
+    migrations = load()
+    target = len(migrations) if target is None else target
+    with engine.connect() as conn:
+        version = current(conn)
+    for m in migrations[version:target]:
+        _apply(engine, m, "upgrade", m.revision)
+    return max(version, target)
+
+
+def downgrade(engine: Engine, target: int) -> int:
+    migrations = load()
+    with engine.connect() as conn:
+        version = current(conn)
+    for m in reversed(migrations[target:version]):
+        _apply(engine, m, "downgrade", m.revision - 1)
+    return min(version, target)
+
+
+# ---------- Helpers for migration scripts ----------
+def create_index_concurrently(conn: Connection, name: str, table: str, columns: str, unique: bool = False) -> None:
+    """Builds an index without blocking writes. A build interrupted earlier leaves an INVALID index behind,
+    which IF NOT EXISTS would silently keep, so that one is dropped first."""
+    invalid = conn.execute(
+        text("SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :n AND NOT i.indisvalid"),
+        {"n": name},
+    ).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
@@ -0,0 +1,47 @@
+from sqlalchemy import text
+
+revision = 1
+description = "baseline schema (adopts databases created by create_all)"
+transactional = True
+
+
+def upgrade(conn):
+    for stmt in (
+        """CREATE TABLE IF NOT EXISTS users (
+            id UUID PRIMARY KEY,
+            email VARCHAR(255) NOT NULL,
+            name VARCHAR(255) NOT NULL,
+            hashed_password VARCHAR(255) NOT NULL,
+            provider VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+        """CREATE TABLE IF NOT EXISTS sessions (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            name VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_sessions_user_id ON sessions (user_id)",
+        """CREATE TABLE IF NOT EXISTS documents (
+            id UUID PRIMARY KEY,
+            session_id UUID NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+            filename VARCHAR(255) NOT NULL,
+            content TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_documents_session_id ON documents (session_id)",
+        """CREATE TABLE IF NOT EXISTS messages (
+            id UUID PRIMARY KEY,
+            session_id UUID NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+            role VARCHAR(50) NOT NULL,
+            type VARCHAR(50) NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_id ON messages (session_id)",
+    ):
+        conn.execute(text(stmt))
+
+
+def downgrade(conn):
+    conn.execute(text("DROP TABLE IF EXISTS messages, documents, sessions, users"))
@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+revision = 2
+description = "document size metadata and background ingestion state"
+transactional = True
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        ALTER TABLE documents
+            ADD COLUMN IF NOT EXISTS char_count INTEGER,
+            ADD COLUMN IF NOT EXISTS page_count INTEGER,
+            ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'ready',
+            ADD COLUMN IF NOT EXISTS progress FLOAT NOT NULL DEFAULT 1,
+            ADD COLUMN IF NOT EXISTS error VARCHAR(500)
+    """))
+
+
+def downgrade(conn):
+    conn.execute(text("""
+        ALTER TABLE documents
+            DROP COLUMN IF EXISTS error,
+            DROP COLUMN IF EXISTS progress,
+            DROP COLUMN IF EXISTS status,
+            DROP COLUMN IF EXISTS page_count,
+            DROP COLUMN IF EXISTS char_count
+    """))
@@ -0,0 +1,37 @@
+from sqlalchemy import text
+
+revision = 3
+description = "content-addressed document blobs and retrieval chunks"
+transactional = True
+
+
+def upgrade(conn):
+    for stmt in (
+        """CREATE TABLE IF NOT EXISTS document_blobs (
+            sha256 VARCHAR(64) PRIMARY KEY,
+            content TEXT NOT NULL,
+            char_count INTEGER NOT NULL,
+            page_count INTEGER,
+            page_offsets JSONB,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )""",
+        "ALTER TABLE documents ADD COLUMN IF NOT EXISTS blob_sha256 VARCHAR(64) REFERENCES document_blobs (sha256)",
+        # New column, all NULL: building the index here is instant
+        "CREATE INDEX IF NOT EXISTS ix_documents_blob_sha256 ON documents (blob_sha256)",
+        """CREATE TABLE IF NOT EXISTS document_chunks (
+            id UUID PRIMARY KEY,
+            document_id UUID REFERENCES documents (id) ON DELETE CASCADE,
+            blob_sha256 VARCHAR(64) REFERENCES document_blobs (sha256) ON DELETE CASCADE,
+            ordinal INTEGER NOT NULL,
+            content TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_document_chunks_document_id_ordinal ON document_chunks (document_id, ordinal)",
+        "CREATE INDEX IF NOT EXISTS ix_document_chunks_blob_sha256_ordinal ON document_chunks (blob_sha256, ordinal)",
+    ):
+        conn.execute(text(stmt))
+
+
+def downgrade(conn):
+    conn.execute(text("DROP TABLE IF EXISTS document_chunks"))
+    conn.execute(text("ALTER TABLE documents DROP COLUMN IF EXISTS blob_sha256"))
+    conn.execute(text("DROP TABLE IF EXISTS document_blobs"))
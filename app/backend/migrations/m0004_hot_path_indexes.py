@@ -0,0 +1,17 @@
+from sqlalchemy import text
+
+from . import create_index_concurrently
+
+revision = 4
+description = "composite indexes for history reads and the session list (built concurrently)"
+transactional = False
+
+
+def upgrade(conn):
+    create_index_concurrently(conn, "ix_messages_session_id_created_at", "messages", "session_id, created_at")
+    create_index_concurrently(conn, "ix_sessions_user_id_created_at_id", "sessions", "user_id, created_at, id")
+
+
+def downgrade(conn):
+    conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_sessions_user_id_created_at_id"))
+    conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_messages_session_id_created_at"))
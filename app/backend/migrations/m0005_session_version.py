@@ -0,0 +1,13 @@
+from sqlalchemy import text
+
+revision = 5
+description = "sessions.version, bumped on every write that changes a session's content"
+transactional = True
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+
+
+def downgrade(conn):
+    conn.execute(text("ALTER TABLE sessions DROP COLUMN IF EXISTS version"))
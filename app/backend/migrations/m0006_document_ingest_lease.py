@@ -0,0 +1,13 @@
+from sqlalchemy import text
+
+revision = 6
+description = "documents.heartbeat_at, the lease of the worker ingesting a document"
+transactional = True
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE documents ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITHOUT TIME ZONE"))
+
+
+def downgrade(conn):
+    conn.execute(text("ALTER TABLE documents DROP COLUMN IF EXISTS heartbeat_at"))
@@ -0,0 +1,13 @@
+from sqlalchemy import text
+
+revision = 7
+description = "documents.upload_host, the host whose upload directory holds a document being ingested"
+transactional = True
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE documents ADD COLUMN IF NOT EXISTS upload_host VARCHAR(255)"))
+
+
+def downgrade(conn):
+    conn.execute(text("ALTER TABLE documents DROP COLUMN IF EXISTS upload_host"))
@@ -1,8 +1,9 @@
 import uuid
 from datetime import datetime
+from typing import Optional
 from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column
-from sqlalchemy import String, Text, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import String, Text, Integer, Float, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 
 class Base(DeclarativeBase):
     pass
@@ -20,26 +21,76 @@ class User(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Session list: WHERE user_id = ? ORDER BY created_at DESC, id DESC (+ keyset cursor)
+        Index("ix_sessions_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
     name: Mapped[str] = mapped_column(String(255), nullable=False, default="Untitled Session")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), default=datetime.utcnow, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")   # see backend.versioning
 
     user: Mapped[User] = relationship("User", back_populates="sessions")
-    documents: Mapped[list["Document"]] = relationship("Document", back_populates="session", cascade="all, delete-orphan")
-    messages: Mapped[list["Message"]] = relationship("Message", back_populates="session", cascade="all, delete-orphan")
+    # passive_deletes: the ON DELETE CASCADE foreign keys remove children, so deleting a session loads none of them
+    documents: Mapped[list["Document"]] = relationship("Document", back_populates="session", cascade="all, delete-orphan",
+                                                       passive_deletes=True)
+    messages: Mapped[list["Message"]] = relationship("Message", back_populates="session", cascade="all, delete-orphan",
+                                                     passive_deletes=True, order_by="[Message.created_at, Message.id]")
 
 class Document(Base):
     __tablename__ = "documents"
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), index=True, nullable=False)
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
-    content: Mapped[str] = mapped_column(Text, nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False)      # legacy rows only; "" when the text lives in `blob`
+    blob_sha256: Mapped[Optional[str]] = mapped_column(String(64), ForeignKey("document_blobs.sha256"), index=True, nullable=True)
+    char_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)   # len(text), NULL on legacy rows
+    page_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)   # PDFs only
+    # Ingestion state: "pending" -> "processing" -> "ready" | "failed" (see backend.ingest)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="ready", server_default="ready")
+    progress: Mapped[float] = mapped_column(Float, nullable=False, default=1.0, server_default="1")
+    error: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=False), nullable=True)  # lease of the worker ingesting it
+    upload_host: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)  # host whose UPLOAD_DIR holds the upload
 
     session: Mapped[Session] = relationship("Session", back_populates="documents")
+    blob: Mapped[Optional["DocumentBlob"]] = relationship("DocumentBlob")
+    chunks: Mapped[list["DocumentChunk"]] = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan",
+                                                         passive_deletes=True, order_by="DocumentChunk.ordinal")
+
+class DocumentBlob(Base):
+    """Extracted text stored once per distinct upload (SHA-256 of the raw bytes) and shared by every
+    Document made from the same file."""
+    __tablename__ = "document_blobs"
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    content: Mapped[str] = mapped_column(Text, nullable=False, deferred=True)   # loaded only when accessed
+    char_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    page_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    page_offsets: Mapped[Optional[list[int]]] = mapped_column(JSONB, nullable=True)  # char offset where each PDF page starts
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), default=datetime.utcnow, nullable=False)
+
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+    __table_args__ = (
+        Index("ix_document_chunks_document_id_ordinal", "document_id", "ordinal"),
+        Index("ix_document_chunks_blob_sha256_ordinal", "blob_sha256", "ordinal"),
+    )
+    # Owned either by a blob (deduplicated uploads) or, for legacy rows, by a single document
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=True)
+    blob_sha256: Mapped[Optional[str]] = mapped_column(String(64), ForeignKey("document_blobs.sha256", ondelete="CASCADE"), nullable=True)
+    ordinal: Mapped[int] = mapped_column(Integer, nullable=False)    # position within the document
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+
+    document: Mapped[Document] = relationship("Document", back_populates="chunks")
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Ordered history reads and `after_id` / `since` delta fetches
+        Index("ix_messages_session_id_created_at", "session_id", "created_at"),
+    )
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), index=True, nullable=False)
     role: Mapped[str] = mapped_column(String(50), nullable=False)      # "user" or "assistant"
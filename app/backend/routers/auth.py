@@ -1,53 +1,68 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from uuid import uuid4
 from ..database import SessionLocal
 from ..models import User
 from ..schemas import UserCreate, UserOut, Token
-from ..security import hash_password, verify_password, create_access_token
-from ..deps import get_db, get_current_user
+from ..security import PasswordHasherBusy, dummy_verify_async, hash_password_async, verify_and_update_async, create_access_token
+from ..deps import CurrentUser, get_db, get_current_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _busy() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         detail="Too many sign-ins right now, please retry shortly", headers={"Retry-After": "1"})
+
+def _find_user(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
 @router.post("/register", response_model=UserOut, status_code=201)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == user_in.email).first():
+async def register(user_in: UserCreate, db: Session = Depends(get_db)):
+    if await run_in_threadpool(_find_user, db, user_in.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # print("Incoming password:", user_in.password)
     # print("Byte length:", len(user_in.password.encode()))
 
 
+    try:
+        hashed = await hash_password_async(user_in.password)
+    except PasswordHasherBusy:
+        raise _busy()
+
     user = User(
         id=uuid4(),
         email=user_in.email,
         name=user_in.name,
-        hashed_password=hash_password(user_in.password),
+        hashed_password=hashed,
         provider="local",
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await run_in_threadpool(db.commit)
+    await run_in_threadpool(db.refresh, user)
     return UserOut(id=user.id, email=user.email, name=user.name, created_at=user.created_at)
 
 @router.post("/login", response_model=Token)
-def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     # form.username is the email for our case
-    user = db.query(User).filter(User.email == form.username).first()
-    print(user.email)
-    print(user.id)
-    print(user.name)
-    print(user.registry)
-    print(user.sessions)
-    print(db.query(User).all())
-    print(User.email)
-    print(form.username)
-    if not user or not verify_password(form.password, user.hashed_password):
+    user = await run_in_threadpool(_find_user, db, form.username)
+    try:
+        if not user:
+            await dummy_verify_async()  # as slow as a wrong password
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+        valid, new_hash = await verify_and_update_async(form.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _busy()
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+    if new_hash:  # BCRYPT_ROUNDS changed since this password was hashed
+        user.hashed_password = new_hash
+        await run_in_threadpool(db.commit)
     token = create_access_token(sub=str(user.id))
     return Token(access_token=token)
 
 @router.get("/me", response_model=UserOut)
-def me(current_user: User = Depends(get_current_user)):
+def me(current_user: CurrentUser = Depends(get_current_user)):
     return UserOut(id=current_user.id, email=current_user.email, name=current_user.name, created_at=current_user.created_at)
@@ -1,30 +1,42 @@
-import json, re
+import asyncio, json, os, re, base64, hashlib, tempfile
 from uuid import uuid4, UUID
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
-
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-
-from ..deps import get_db, get_current_user
-from ..models import User, Session as DBSession, Document, Message
-from ..schemas import SessionOut, SessionDetail
-from ..utils.file_extract import extract_text_from_file
-from ..utils.openai_client import generate_title, detect_language_simple, chat
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, Depends, HTTPException, Form, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, literal_column, select, true, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session, selectinload
+
+from .. import ingest
+from ..database import SessionLocal
+from ..deps import CurrentUser, get_db, get_current_user
+from ..models import Session as DBSession, Document, DocumentBlob, Message
+from ..schemas import SessionOut, SessionDetail, DocumentContent
+from ..utils.file_extract import is_supported
+from ..utils.openai_client import generate_title, heuristic_title, detect_language_simple, chat, chat_stream
+from ..utils.context import ContextResult, assemble_context
+from ..utils.retrieval import retrieve_chunks
+from ..utils.cache import get_response_cache, response_cache_key
+from ..utils.uploads import form_schema, receive_form
+from ..utils.transcribe import transcribe_file, transcribe_stream
+from ..settings import get_settings
 
 router = APIRouter(prefix="/session", tags=["sessions"])
 
-# Build model context from DB entities
-def build_context(db_sess: DBSession, include_recent: int = 30):
-    msgs = []
-    msgs.append({"role":"system","content":"You are EduMentorAI, an educational assistant. When asked, respond in the requested language."})
-    for d in db_sess.documents:
-        excerpt = (d.content or "")[:2000]
-        msgs.append({"role":"user","content": f"Document '{d.filename}' content (excerpt):\n{excerpt}"})
-    last = sorted(db_sess.messages, key=lambda m: m.created_at)[-include_recent:]
-    for m in last:
-        msgs.append({"role": m.role, "content": m.content})
-    return msgs
+SYSTEM_PROMPT = "You are EduMentorAI, an educational assistant. When asked, respond in the requested language."
+
+# Build model context from DB entities, fitted to the configured token budget.
+# Documents contribute their chunks most relevant to `query` (evenly spread chunks when there is none).
+def build_context(db: Session, db_sess: DBSession, prompt: str, lang_instruction: str, query: Optional[str],
+                  inline_documents: bool = False, include_history: bool = True) -> ContextResult:
+    documents = [(c.label, c.content) for c in retrieve_chunks(db, db_sess.id, query)]
+    history = [(m.role, m.content) for m in db_sess.messages] if include_history else []
+    return assemble_context([SYSTEM_PROMPT, lang_instruction], documents, history, prompt,
+                            inline_documents=inline_documents)
 
 # @router.get("/sessions")
 # def sessions_alias(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -39,27 +51,148 @@ def build_context(db_sess: DBSession, include_recent: int = 30):
 #     ]
 
 
+def _message_out(m: Message) -> dict:
+    return {"id": str(m.id), "role": m.role, "type": m.type, "content": m.content, "created_at": m.created_at.isoformat()}
+
+# Document metadata only; the text itself is served by GET /{sid}/documents/{doc_id}/content
+def _documents_out(db: Session, session_id: UUID) -> list[dict]:
+    rows = (
+        db.query(
+            Document.id,
+            Document.filename,
+            func.coalesce(Document.char_count, func.length(Document.content)).label("char_count"),
+            Document.page_count,
+            Document.status,
+        )
+        .filter(Document.session_id == session_id)
+        .all()
+    )
+    return [
+        {"id": str(r.id), "filename": r.filename, "char_count": r.char_count, "page_count": r.page_count, "status": r.status}
+        for r in rows
+    ]
+
+# Keyset cursor for the lean session list: "<created_at iso>|<session id>" (urlsafe base64)
+def _encode_cursor(created_at: datetime, session_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{session_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(session_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ---------- Conditional GET ----------
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def _sessions_digest(db: Session, user_id: UUID) -> str:
+    """md5 over (id, version) of all the user's sessions, for the full list (which returns all of them)."""
+    listing = func.string_agg(
+        func.concat(DBSession.id, ":", DBSession.version), aggregate_order_by(literal_column("','"), DBSession.id)
+    )
+    return db.query(func.coalesce(func.md5(listing), "empty")).filter(DBSession.user_id == user_id).scalar()
+
 @router.get("/list", response_model=list[dict])
-def list_sessions(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    sessions = db.query(DBSession).filter(DBSession.user_id == current_user.id).order_by(DBSession.created_at.desc()).all()
+def list_sessions(
+    response: Response,
+    lean: bool = Query(False),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # ETags cover (id, version) of the sessions in the response: any create, delete or write changes them
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    if lean:
+        # The page of sessions is picked first (keyset + LIMIT on the sessions index), then message
+        # count and latest timestamp are aggregated for those sessions only, so a page costs the same
+        # however much history the user has. No messages are loaded.
+        # The cursor for the next page (if any) is returned in the X-Next-Cursor header.
+        page = (
+            db.query(DBSession.id, DBSession.name, DBSession.created_at, DBSession.version)
+            .filter(DBSession.user_id == current_user.id)
+        )
+        if cursor:
+            created_at, session_id = _decode_cursor(cursor)
+            page = page.filter(tuple_(DBSession.created_at, DBSession.id) < tuple_(created_at, session_id))
+        page = page.order_by(DBSession.created_at.desc(), DBSession.id.desc()).limit(limit + 1).subquery()
+        stats = (
+            select(func.count(Message.id).label("message_count"), func.max(Message.created_at).label("last_activity"))
+            .where(Message.session_id == page.c.id)
+            .lateral()
+        )
+        rows = db.execute(
+            select(page, stats.c.message_count, stats.c.last_activity)
+            .join(stats, true())
+            .order_by(page.c.created_at.desc(), page.c.id.desc())
+        ).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        # The page's own rows decide its tag (with the cursor and whether a next page exists), so
+        # revalidating one page never aggregates over the rest of the user's sessions
+        page_key = f"{cursor or ''}|{limit}|{int(has_more)}|" + ",".join(f"{r.id}:{r.version}" for r in rows)
+        etag = f'"p{hashlib.md5(page_key.encode()).hexdigest()}"'
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        response.headers["ETag"] = etag
+        if has_more:
+            response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
+        return [
+            {
+                "id": str(r.id),
+                "name": r.name,
+                "created_at": r.created_at.isoformat(),
+                "version": r.version,
+                "message_count": r.message_count,
+                "last_activity": (r.last_activity or r.created_at).isoformat(),
+            }
+            for r in rows
+        ]
+
+    etag = f'"l{_sessions_digest(db, current_user.id)}"'
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
+
+    sessions = (
+        db.query(DBSession)
+        .options(selectinload(DBSession.messages))
+        .filter(DBSession.user_id == current_user.id)
+        .order_by(DBSession.created_at.desc())
+        .all()
+    )
     out = []
     for s in sessions:
         out.append({
             "id": str(s.id),
             "name": s.name,
             "created_at": s.created_at.isoformat(),
-            "messages": [
-                {
-                    "id": str(m.id),
-                    "role": m.role, "type": m.type, "content": m.content,
-                    "created_at": m.created_at.isoformat()
-                } for m in sorted(s.messages, key=lambda x: x.created_at)
-            ]
+            "version": s.version,
+            "messages": [_message_out(m) for m in s.messages]
         })
     return out
 
+@router.get("/versions")
+def session_versions(current_user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    """{session_id: version} for all of the user's sessions: one narrow query clients can poll to see what changed."""
+    rows = db.query(DBSession.id, DBSession.version).filter(DBSession.user_id == current_user.id).all()
+    return {str(r.id): r.version for r in rows}
+
 @router.post("/new")
-def create_session(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_session(current_user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
     s = DBSession(id=uuid4(), user_id=current_user.id, name="Untitled Session")
     db.add(s)
     db.commit()
@@ -67,26 +200,87 @@ def create_session(current_user: User = Depends(get_current_user), db: Session =
     return {"session_id": str(s.id)}
 
 @router.get("/{sid}", response_model=dict)
-def get_session(sid: UUID, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    s = db.query(DBSession).filter(DBSession.id == sid, DBSession.user_id == current_user.id).first()
-    if not s:
-        raise HTTPException(status_code=404, detail="Session not found")
+def get_session(
+    sid: UUID,
+    response: Response,
+    after_id: Optional[UUID] = Query(None),
+    since: Optional[datetime] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # The session row alone decides freshness: on a matching If-None-Match no messages are loaded.
+    # (The body for a given URL is fully determined by the version, delta parameters included.)
+    s = _get_owned_session(db, sid, current_user.id)
+    etag = f'"s{s.version}"'
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    if after_id or since:
+        # Delta mode: only messages newer than what the client already holds (no documents)
+        q = db.query(Message).filter(Message.session_id == s.id)
+        if after_id:
+            anchor = db.query(Message.created_at).filter(Message.id == after_id, Message.session_id == s.id).first()
+            if not anchor:
+                raise HTTPException(status_code=404, detail="Message not found")
+            q = q.filter(tuple_(Message.created_at, Message.id) > tuple_(anchor.created_at, after_id))
+        if since:
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)  # stored as naive UTC
+            q = q.filter(Message.created_at > since)
+        return {
+            "id": str(s.id),
+            "name": s.name,
+            "version": s.version,
+            "delta": True,
+            "messages": [_message_out(m) for m in q.order_by(Message.created_at, Message.id).all()],
+        }
+
     return {
         "id": str(s.id),
         "name": s.name,
         "created_at": s.created_at.isoformat(),
-        "messages": [
-            {"id": str(m.id), "role": m.role, "type": m.type, "content": m.content, "created_at": m.created_at.isoformat()}
-            for m in sorted(s.messages, key=lambda x: x.created_at)
-        ],
-        "documents": [
-            {"id": str(d.id), "filename": d.filename, "content": d.content}
-            for d in s.documents
-        ]
+        "version": s.version,
+        "messages": [_message_out(m) for m in s.messages],
+        "documents": _documents_out(db, s.id)
     }
 
+@router.get("/{sid}/documents/{doc_id}/content", response_model=DocumentContent)
+def get_document_content(
+    sid: UUID,
+    doc_id: UUID,
+    offset: int = Query(0, ge=0),
+    length: Optional[int] = Query(None, ge=1),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Slice in SQL so only the requested range leaves the database (substr is 1-based)
+    source = func.coalesce(DocumentBlob.content, Document.content)
+    text = func.substr(source, offset + 1, length) if length else func.substr(source, offset + 1)
+    row = (
+        db.query(
+            Document.id,
+            Document.filename,
+            func.coalesce(Document.char_count, func.length(Document.content)).label("char_count"),
+            Document.page_count,
+            text.label("content"),
+        )
+        .join(DBSession, DBSession.id == Document.session_id)
+        .outerjoin(DocumentBlob, DocumentBlob.sha256 == Document.blob_sha256)
+        .filter(Document.id == doc_id, DBSession.id == sid, DBSession.user_id == current_user.id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return DocumentContent(
+        id=row.id, filename=row.filename, char_count=row.char_count, page_count=row.page_count,
+        offset=offset, content=row.content or "",
+    )
+
 @router.delete("/{sid}")
-def delete_session(sid: UUID, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_session(sid: UUID, current_user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
     s = db.query(DBSession).filter(DBSession.id == sid, DBSession.user_id == current_user.id).first()
     if not s:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -94,106 +288,280 @@ def delete_session(sid: UUID, current_user: User = Depends(get_current_user), db
     db.commit()
     return {"message": "Session deleted"}
 
-@router.post("/{sid}/upload")
+@router.get("/{sid}/documents/{doc_id}/status")
+def get_document_status(
+    sid: UUID,
+    doc_id: UUID,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    row = (
+        db.query(Document.id, Document.filename, Document.status, Document.progress, Document.error)
+        .join(DBSession, DBSession.id == Document.session_id)
+        .filter(Document.id == doc_id, DBSession.id == sid, DBSession.user_id == current_user.id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"id": str(row.id), "filename": row.filename, "status": row.status, "progress": row.progress, "error": row.error}
+
+@router.post("/{sid}/upload", openapi_extra=form_schema(file="file", text="string"))
 async def upload_file(
     sid: UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    file: Optional[UploadFile] = File(None),
-    text: Optional[str] = Form(None)
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    s = db.query(DBSession).filter(DBSession.id == sid, DBSession.user_id == current_user.id).first()
-    if not s:
-        raise HTTPException(status_code=404, detail="Session not found")
+    s = await run_in_threadpool(_get_owned_session, db, sid, current_user.id)
+    # No connection is held while the client sends the body
+    await run_in_threadpool(_release_connection, db)
+    document_id = uuid4()
+
+    def document_path(filename: str) -> str:
+        if not is_supported(filename):
+            raise HTTPException(status_code=400, detail="Unsupported file type")
+        return ingest.upload_path(document_id, filename)
+
+    # The file part is written straight to its ingestion path as it arrives
+    form = await receive_form(request, document_path, get_settings().MAX_UPLOAD_BYTES)
+    file, text = form.file, form.fields.get("text")
 
     if file:
-        content = extract_text_from_file(file)
-        if not content:
-            raise HTTPException(status_code=400, detail="Could not extract text from file")
-        d = Document(id=uuid4(), session_id=s.id, filename=file.filename, content=content)
+        # Accepted immediately (202); extraction and indexing run in backend.ingest.
+        # Poll GET /{sid}/documents/{document_id}/status until it is "ready" or "failed".
+        # Files whose bytes were already extracted are linked to the stored text at once (201).
+        d = Document(id=document_id, session_id=s.id, filename=file.filename, content="", status="pending", progress=0.0,
+                     upload_host=ingest.host())
+        path, sha256 = file.path, file.sha256
+        blob = await run_in_threadpool(db.get, DocumentBlob, sha256)
+        if blob is not None:
+            os.remove(path)
+            # Same bytes were extracted before (any user / session): reuse the text, skip extraction
+            db.add(d)
+            ingest.attach_blob(db, d, blob)
+            await run_in_threadpool(db.commit)
+            return JSONResponse(status_code=201, content={
+                "message": "File uploaded successfully", "filename": file.filename,
+                "document_id": str(d.id), "status": "ready",
+            })
+
         db.add(d)
-        db.add(Message(id=uuid4(), session_id=s.id, role="assistant", type="upload",
-                       content=f"📄 Document '{file.filename}' uploaded successfully.", created_at=datetime.utcnow()))
-        db.commit()
-        return {"message": "File uploaded successfully", "filename": file.filename}
+        await run_in_threadpool(db.commit)
+        ingest.submit(d.id, path, file.filename, sha256)
+        return JSONResponse(status_code=202, content={
+            "message": "File accepted for processing", "filename": file.filename,
+            "document_id": str(d.id), "status": "pending",
+        })
 
     if text:
         db.add(Message(id=uuid4(), session_id=s.id, role="user", type="text",
                        content=text.strip(), created_at=datetime.utcnow()))
-        db.commit()
+        await run_in_threadpool(db.commit)
         return {"message": "Text message received", "text": text.strip()}
 
     raise HTTPException(status_code=400, detail="No file or text provided.")
 
-@router.post("/{sid}/message")
-def send_message(
-    sid: UUID,
-    text: str = Form(...),
-    lang: Optional[str] = Form(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    s = db.query(DBSession).filter(DBSession.id == sid, DBSession.user_id == current_user.id).first()
+# ---------- Chat / actions ----------
+# These routes are async so an in-flight LLM call holds no worker thread; every (sync)
+# SQLAlchemy step is offloaded with run_in_threadpool instead of running on the event loop.
+def _get_owned_session(db: Session, sid: UUID, user_id: UUID, with_messages: bool = False) -> DBSession:
+    q = db.query(DBSession)
+    if with_messages:
+        q = q.options(selectinload(DBSession.messages))
+    s = q.filter(DBSession.id == sid, DBSession.user_id == user_id).first()
     if not s:
         raise HTTPException(status_code=404, detail="Session not found")
+    return s
+
+def _save_turn(db: Session, s: DBSession, msg_type: str, user_content: str, assistant_text: str, full: bool = False) -> dict:
+    # By default only what the client appends is returned: the two new messages plus the (possibly
+    # renamed) session name and version. `full` adds the whole session under "session".
+    new = [
+        Message(id=uuid4(), session_id=s.id, role="user", type=msg_type, content=user_content, created_at=datetime.utcnow()),
+        Message(id=uuid4(), session_id=s.id, role="assistant", type=msg_type, content=assistant_text, created_at=datetime.utcnow()),
+    ]
+    if full:
+        s.messages.extend(new)  # loaded (ordered) collection: the full response needs no refresh/reload
+    else:
+        db.add_all(new)
+    db.flush()  # bumps s.version
+    out = {"name": s.name, "version": s.version, "messages": [_message_out(m) for m in new]}
+    if full:
+        out["session"] = {
+            "id": str(s.id),
+            "name": s.name,
+            "version": s.version,
+            "messages": [_message_out(m) for m in s.messages],
+            "documents": _documents_out(db, s.id),
+        }
+    db.commit()
+    return out
+
+# The first turn names the session. The title is generated alongside the reply instead of before or
+# after it; if it is not ready shortly after the reply, the local heuristic title is used.
+# The title request is started once the context is built and cancelled however the block is left.
+@asynccontextmanager
+async def _title_alongside(session_name: str, prompt: str):
+    task = None
+    if session_name == "Untitled Session" and prompt.strip():
+        task = asyncio.create_task(generate_title(prompt))
+    try:
+        yield task
+    finally:
+        if task is not None and not task.done():
+            task.cancel()
 
-    if s.name == "Untitled Session" and text.strip():
-        s.name = generate_title(text)
+async def _finish_title(task: Optional[asyncio.Task], prompt: str) -> Optional[str]:
+    if task is None:
+        return None
+    try:
+        return await asyncio.wait_for(task, get_settings().TITLE_WAIT_SECONDS)
+    except asyncio.TimeoutError:  # wait_for cancels the title request
+        return heuristic_title(prompt)
 
+# Shared by the blocking and streaming chat endpoints: builds the model context
+async def _prepare_chat(db: Session, s: DBSession, text: str, lang: Optional[str]) -> ContextResult:
     if not lang:
         lang = detect_language_simple(text)
 
-    messages_for_model = build_context(s)
-    messages_for_model.append({"role": "user", "content": text})
-    if lang == "ar":
-        messages_for_model.insert(1, {"role":"system","content":"Please respond in Arabic."})
-    else:
-        messages_for_model.insert(1, {"role":"system","content":"Please respond in English."})
+    lang_instruction = "Please respond in Arabic." if lang == "ar" else "Please respond in English."
+    return await run_in_threadpool(build_context, db, s, text, lang_instruction, query=text)
 
+def _release_connection(db: Session) -> None:
+    """Ends the request's read transaction before a long wait (a model call, an upload body), so no
+    pooled connection is held for its duration; loaded objects stay usable and the next statement starts a new transaction."""
+    db.expire_on_commit = False
     try:
-        assistant_text = chat(messages_for_model)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OpenAI error: {e}")
+        db.commit()
+    finally:
+        db.expire_on_commit = True
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _persist_messages(messages: list[Message], title: Optional[str] = None) -> tuple[Optional[str], Optional[int]]:
+    """Stores the streamed exchange (and the first-turn title); returns the session's new name and version,
+    or (None, None) if the session was deleted meanwhile."""
+    with SessionLocal() as wdb:
+        # Locked until the commit, so a concurrent delete cannot orphan the messages
+        s = wdb.get(DBSession, messages[0].session_id, with_for_update=True)
+        if s is None:
+            return None, None
+        wdb.add_all(messages)
+        if title and s.name == "Untitled Session":
+            s.name = title
+        wdb.flush()  # bumps s.version
+        name, version = s.name, s.version
+        wdb.commit()
+        return name, version
 
-    db.add(Message(id=uuid4(), session_id=s.id, role="user", type="chat", content=text, created_at=datetime.utcnow()))
-    db.add(Message(id=uuid4(), session_id=s.id, role="assistant", type="chat", content=assistant_text, created_at=datetime.utcnow()))
-    db.commit()
-    db.refresh(s)
+@router.post("/{sid}/message")
+async def send_message(
+    sid: UUID,
+    text: str = Form(...),
+    lang: Optional[str] = Form(None),
+    full: bool = Query(False),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    s = await run_in_threadpool(_get_owned_session, db, sid, current_user.id, True)
+    ctx = await _prepare_chat(db, s, text, lang)
+    await run_in_threadpool(_release_connection, db)
 
-    return {"reply": assistant_text, "session": {
-        "id": str(s.id),
-        "name": s.name,
-        "messages": [
-            {"id": str(m.id), "role": m.role, "type": m.type, "content": m.content, "created_at": m.created_at.isoformat()}
-            for m in sorted(s.messages, key=lambda x: x.created_at)
-        ],
-        "documents": [{"id": str(d.id), "filename": d.filename, "content": d.content} for d in s.documents],
-    }}
+    async with _title_alongside(s.name, text) as title_task:
+        try:
+            assistant_text = await chat(ctx.messages)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"OpenAI error: {e}")
+        title = await _finish_title(title_task, text)
+    if title:
+        s.name = title
+    out = await run_in_threadpool(_save_turn, db, s, "chat", text, assistant_text, full)
+    return {"reply": assistant_text, "context_tokens": ctx.usage, **out}
+
+@router.post("/{sid}/message/stream")
+async def stream_message(
+    sid: UUID,
+    text: str = Form(...),
+    lang: Optional[str] = Form(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Same as /message, but the reply is sent as server-sent events while it is generated:
+    `delta` events carry text fragments, then a single `done` (with the persisted messages)
+    or `error` event ends the stream."""
+    s = await run_in_threadpool(_get_owned_session, db, sid, current_user.id, True)
+    ctx = await _prepare_chat(db, s, text, lang)
+    session_id, session_name = s.id, s.name
+    await run_in_threadpool(db.commit)  # any chunk backfill; the request session is not used while streaming
+
+    async def event_stream():
+        parts = []
+        # Closing the stream (client gone) leaves the block too, which cancels the title request
+        async with _title_alongside(session_name, text) as title_task:
+            try:
+                async for delta in chat_stream(ctx.messages):
+                    parts.append(delta)
+                    yield _sse("delta", {"text": delta})
+            except Exception as e:
+                yield _sse("error", {"detail": f"OpenAI error: {e}"})
+                return
+            title = await _finish_title(title_task, text)
+
+        user_msg = Message(id=uuid4(), session_id=session_id, role="user", type="chat", content=text, created_at=datetime.utcnow())
+        assistant_msg = Message(id=uuid4(), session_id=session_id, role="assistant", type="chat", content="".join(parts),
+                                created_at=datetime.utcnow())
+        messages_out = [_message_out(user_msg), _message_out(assistant_msg)]  # before the commit expires them
+        try:
+            name, version = await run_in_threadpool(_persist_messages, [user_msg, assistant_msg], title)
+        except Exception as e:
+            yield _sse("error", {"detail": f"Could not save the reply: {e}"})
+            return
+        if name is None:
+            yield _sse("error", {"detail": "Session not found"})
+            return
+        done = {
+            "name": name,
+            "version": version,
+            "messages": messages_out,
+            "context_tokens": ctx.usage,
+        }
+        yield _sse("done", done)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+CACHEABLE_ACTIONS = {"summarize", "flashcards", "resources"}
+
+def _has_documents(db: Session, session_id: UUID) -> bool:
+    return db.query(Document.id).filter(Document.session_id == session_id, Document.status == "ready").first() is not None
 
 @router.post("/{sid}/generate/{action}")
-def generate_action(
+async def generate_action(
     sid: UUID,
     action: str,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db),
     text: Optional[str] = Form(""),
     lang: Optional[str] = Form("en"),
     difficulty: Optional[str] = Form(None),
     num_questions: Optional[int] = Form(None),
     text_grammar: Optional[str] = Form(None),
-    report_type: Optional[str] = Form(None)
+    report_type: Optional[str] = Form(None),
+    full: bool = Query(False)
 ):
     valid_actions = {"summarize","quiz","flashcards","resources","report","grammar"}
     if action not in valid_actions:
         raise HTTPException(status_code=400, detail="Invalid action")
 
-    s = db.query(DBSession).filter(DBSession.id == sid, DBSession.user_id == current_user.id).first()
-    if not s:
-        raise HTTPException(status_code=404, detail="Session not found")
+    s = await run_in_threadpool(_get_owned_session, db, sid, current_user.id, True)
 
-    docs_text = "\n\n".join([d.content for d in s.documents])
     # if not docs_text and not text:
-    if action != "grammar" and not docs_text and not text:
+    has_documents = await run_in_threadpool(_has_documents, db, s.id)
+    if action != "grammar" and not has_documents and not text:
         raise HTTPException(status_code=400, detail="No documents or additional text provided for this action")
     
 
@@ -240,20 +608,34 @@ def generate_action(
     system_lang = "Respond in Arabic." if lang == "ar" else "Respond in English."
 
     
+    # Cacheable actions depend only on the documents and the request, not on the chat history,
+    # so identical requests over the same material (in any session) reuse the previous reply.
+    cacheable = action in CACHEABLE_ACTIONS
     if action == "grammar":
-        combined = base_prompt
+        ctx = await run_in_threadpool(build_context, db, s, base_prompt, system_lang, query=text_grammar)
     else:
-        # --- Combine all content for model ---
-        combined = f"{base_prompt}\n\nText bar input:\n{text}\n\nDocuments content:\n{docs_text}"
-
-    messages_for_model = build_context(s)
-    messages_for_model.insert(1, {"role":"system", "content": system_lang})
-    messages_for_model.append({"role":"user","content": combined})
-
-    try:
-        assistant_text = chat(messages_for_model)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OpenAI error: {e}")
+        # --- Combine all content for model (document excerpts are appended within budget) ---
+        combined = f"{base_prompt}\n\nText bar input:\n{text}"
+        ctx = await run_in_threadpool(build_context, db, s, combined, system_lang, query=text,
+                                      inline_documents=True, include_history=not cacheable)
+
+    cache = get_response_cache()
+    cache_key = response_cache_key(action, text, ctx.documents_digest, lang, get_settings().OPENAI_CHAT_MODEL) if cacheable else None
+    assistant_text = await cache.get(cache_key) if cache_key else None
+    cached = assistant_text is not None
+    if cached:
+        # Nothing to overlap a title request with: name the session locally
+        title = heuristic_title(text or action) if s.name == "Untitled Session" else None
+    else:
+        await run_in_threadpool(_release_connection, db)
+        async with _title_alongside(s.name, text or action) as title_task:
+            try:
+                assistant_text = await chat(ctx.messages)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"OpenAI error: {e}")
+            title = await _finish_title(title_task, text or action)
+        if cache_key and assistant_text:
+            await cache.set(cache_key, assistant_text)
 
     if action == "quiz":
         n = num_questions or 5
@@ -266,60 +648,52 @@ def generate_action(
         except Exception:
             assistant_text = "[]"
 
-    if s.name == "Untitled Session":
-        s.name = generate_title(text or action)
-
-    db.add(Message(id=uuid4(), session_id=s.id, role="user", type=action, content=(text or action.capitalize()), created_at=datetime.utcnow()))
-    db.add(Message(id=uuid4(), session_id=s.id, role="assistant", type=action, content=assistant_text, created_at=datetime.utcnow()))
-    db.commit()
-    db.refresh(s)
+    if title:
+        s.name = title
 
+    out = await run_in_threadpool(_save_turn, db, s, action, text or action.capitalize(), assistant_text, full)
     return {
         "reply": assistant_text,
-        "session": {
-            "id": str(s.id),
-            "name": s.name,
-            "messages": [
-                {"id": str(m.id), "role": m.role, "type": m.type, "content": m.content, "created_at": m.created_at.isoformat()}
-                for m in sorted(s.messages, key=lambda x: x.created_at)
-            ],
-            "documents": [{"id": str(d.id), "filename": d.filename, "content": d.content} for d in s.documents],
-        }
+        "cached": cached,
+        "context_tokens": ctx.usage,
+        **out
     }
 
 
 
 
 
-@router.post("/{sid}/transcribe")
+async def _receive_audio(request: Request) -> tuple[str, str, str]:
+    """Writes an audio upload to a unique file (concurrent requests never share a path) as it arrives;
+    returns (path, filename, lang)."""
+    settings = get_settings()
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+
+    def audio_path(filename: str) -> str:
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1] or ".wav", dir=settings.UPLOAD_DIR)
+        os.close(fd)
+        return path
+
+    form = await receive_form(request, audio_path, settings.MAX_AUDIO_BYTES)
+    if form.file is None:
+        raise HTTPException(status_code=422, detail="No audio file provided")
+    return form.file.path, form.file.filename or "audio.wav", form.fields.get("lang") or "en"
+
+@router.post("/{sid}/transcribe", openapi_extra=form_schema(file="file", lang="string"))
 async def transcribe_audio(
     sid: UUID,
-    file: UploadFile = File(...),
-    lang: Optional[str] = Form("en"),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    s = db.query(DBSession).filter(DBSession.id == sid, DBSession.user_id == current_user.id).first()
-    if not s:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    temp_path = "temp_audio.wav"
-    audio_bytes = await file.read()
-    with open(temp_path, "wb") as f:
-        f.write(audio_bytes)
-
+    await run_in_threadpool(_get_owned_session, db, sid, current_user.id)
+    await run_in_threadpool(_release_connection, db)
+    temp_path, filename, lang = await _receive_audio(request)
     try:
-        from ..utils.openai_client import client
-        with open(temp_path, "rb") as f:
-            transcript = client.audio.transcriptions.create(
-                model="gpt-4o-transcribe",
-                file=f,
-                language=lang or "en"
-            )
+        text = await transcribe_file(temp_path, filename, lang)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
     finally:
-        import os
         if os.path.exists(temp_path):
             os.remove(temp_path)
 
@@ -333,7 +707,38 @@ async def transcribe_audio(
     # ))
     # db.commit()
 
-    return {"transcription": transcript.text}
+    return {"transcription": text}
+
+@router.post("/{sid}/transcribe/stream", openapi_extra=form_schema(file="file", lang="string"))
+async def stream_transcription(
+    sid: UUID,
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events: `partial` {index, text} per segment in order, then `done` {transcription} or `error`."""
+    await run_in_threadpool(_get_owned_session, db, sid, current_user.id)
+    await run_in_threadpool(_release_connection, db)
+    temp_path, filename, lang = await _receive_audio(request)
+
+    async def events():
+        parts = []
+        try:
+            async for text in transcribe_stream(temp_path, filename, lang):
+                parts.append(text)
+                yield _sse("partial", {"index": len(parts) - 1, "text": text})
+            yield _sse("done", {"transcription": " ".join(p for p in parts if p)})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Transcription failed: {e}"})
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 
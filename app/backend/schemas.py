@@ -26,10 +26,16 @@ class UserOut(UserBase):
 # ---------- Documents / Messages ----------
 class DocumentBase(BaseModel):
     filename: str
-    content: str
 
 class DocumentOut(DocumentBase):
     id: UUID
+    char_count: int
+    page_count: Optional[int] = None
+    status: str = "ready"
+
+class DocumentContent(DocumentOut):
+    offset: int
+    content: str
 
 class MessageBase(BaseModel):
     role: str
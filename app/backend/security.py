@@ -1,3 +1,6 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import jwt, JWTError
@@ -6,7 +9,17 @@ from .settings import get_settings
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def _password_context(rounds: int) -> CryptContext:
+    # min == max rounds: hashes made with any other cost are flagged and rehashed on the next login
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+pwd_context = _password_context(settings.BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -14,6 +27,42 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+# ---------- Bounded bcrypt executor ----------
+# bcrypt is deliberately slow; running it on its own small pool keeps a login burst from
+# occupying the shared threadpool that chat requests need. Work beyond the pool plus
+# PASSWORD_HASH_QUEUE_LIMIT waiting jobs is refused instead of queued.
+
+class PasswordHasherBusy(Exception):
+    pass
+
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_admitted = 0
+_admitted_lock = threading.Lock()
+
+async def _run_hasher(fn, *args):
+    global _admitted
+    with _admitted_lock:
+        if _admitted >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_LIMIT:
+            raise PasswordHasherBusy()
+        _admitted += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        with _admitted_lock:
+            _admitted -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(pwd_context.hash, password)
+
+async def verify_and_update_async(plain: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is set when the stored hash uses an outdated scheme or cost."""
+    return await _run_hasher(pwd_context.verify_and_update, plain, hashed)
+
+async def dummy_verify_async() -> None:
+    """Costs as much as verify_and_update_async; for unknown emails, so response times don't tell
+    which accounts exist."""
+    await _run_hasher(pwd_context.dummy_verify)
+
 def create_access_token(sub: str, expires_minutes: Optional[int] = None) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"sub": sub, "exp": expire}
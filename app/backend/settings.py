@@ -3,6 +3,7 @@ from pydantic import field_validator
 from functools import lru_cache
 from typing import Optional
 import os
+import tempfile
 
 class Settings(BaseSettings):
     APP_NAME: str = "EduMentorAI Backend"
@@ -13,6 +14,44 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None    # e.g. a local OpenAI-compatible server for load tests
+    OPENAI_CHAT_MODEL: str = "gpt-4o-mini"
+    TITLE_WAIT_SECONDS: float = 1.0          # extra wait for the generated title once the reply is ready
+
+    # Cache of model replies for deterministic actions (summarize, flashcards, resources)
+    RESPONSE_CACHE_TTL_SECONDS: int = 3600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    RESPONSE_CACHE_REDIS_URL: Optional[str] = None   # shared across workers when set (needs `redis`)
+
+    # Prompt context budget (tokens, counted locally by utils.tokens)
+    CONTEXT_MAX_TOKENS: int = 16000
+    CONTEXT_COMPLETION_RESERVE: int = 2000   # left free for the model's answer
+    CONTEXT_DOCUMENT_SHARE: float = 0.6      # share of the remaining budget offered to documents
+
+    # Background document ingestion
+    UPLOAD_DIR: str = os.path.join(tempfile.gettempdir(), "edumentor-uploads")
+    INGEST_WORKERS: int = 2                  # uploads processed concurrently
+    INGEST_LEASE_SECONDS: int = 120          # a "processing" job not renewed for this long is taken over
+    INGEST_HOST: Optional[str] = None        # owner of UPLOAD_DIR's files; None = hostname. Same value on replicas sharing it
+    EXTRACT_PROCESSES: Optional[int] = None  # extraction processes (CPU-bound PDF parsing) per API worker
+    WEB_CONCURRENCY: int = 1                 # API workers per host (as uvicorn --workers); None above = cores // this
+    PDF_PAGES_PER_TASK: int = 20             # page range handed to one extraction process
+
+    # Uploads are spooled to disk in fixed-size chunks; larger requests are rejected with 413
+    MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    MAX_AUDIO_BYTES: int = 25 * 1024 * 1024  # OpenAI transcription limit
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+
+    # Speech to text
+    TRANSCRIBE_MODEL: str = "gpt-4o-transcribe"
+    TRANSCRIBE_SEGMENT_SECONDS: int = 60     # long WAV recordings are split and transcribed in parallel
+    TRANSCRIBE_CONCURRENCY: int = 8          # transcription requests in flight per process
+
+    # Document chunking / retrieval
+    CHUNK_CHARS: int = 1500
+    CHUNK_OVERLAP_CHARS: int = 200
+    RETRIEVAL_TOP_K: int = 12
+    RETRIEVAL_INDEX_CACHE_SIZE: int = 128    # sessions whose BM25 index is kept in memory
 
     # ✅ Add type annotations for DB config
     DB_USER: str = os.getenv("APP_DB_USER", "edumentor")
@@ -24,10 +63,31 @@ class Settings(BaseSettings):
     # ✅ Annotate DATABASE_URL too
     DATABASE_URL: str = f"postgresql+psycopg://{os.getenv('APP_DB_USER', 'edumentor')}:{os.getenv('APP_DB_PASSWORD', 'edumentorpw')}@{os.getenv('APP_DB_HOST', 'db')}:{os.getenv('APP_DB_PORT', '5432')}/{os.getenv('APP_DB_NAME', 'edumentor')}"
 
+    # Connection pool (per worker process). With pgbouncer in transaction mode set DB_PGBOUNCER:
+    # the app then keeps no pool of its own and never uses server-side prepared statements.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0            # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800              # seconds; replaces connections before server/proxy idle limits
+    DB_POOL_PRE_PING: bool = True            # one extra round trip per checkout; off if recycle suffices
+    DB_PGBOUNCER: bool = False
+
+    # Startup: the database is probed with exponential backoff (see main.wait_for_db, backend.migrate)
+    DB_STARTUP_INITIAL_DELAY: float = 0.25
+    DB_STARTUP_MAX_DELAY: float = 5.0
+    DB_STARTUP_TIMEOUT_SECONDS: float = 60.0  # migration step only; the API keeps probing
+
     # JWT
     JWT_SECRET: str
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
+    AUTH_CACHE_TTL_SECONDS: int = 60         # validated token -> user snapshot (see deps.get_current_user)
+    AUTH_CACHE_MAX_ENTRIES: int = 4096
+
+    # Password hashing (bcrypt) runs on its own pool; beyond workers + queue limit requests get 503
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
 
     # Azure (optional)
     AZURE_POSTGRES_SSLMODE: Optional[str] = "require"
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Optional
+
+from ..settings import get_settings
+
+try:  # optional shared backend
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, ttl_seconds: Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate) -> int:
+        """Removes every entry whose value matches; a scan, so meant for rare invalidations."""
+        with self._lock:
+            keys = [k for k, (_, value) in self._data.items() if predicate(value)]
+            for k in keys:
+                del self._data[k]
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def response_cache_key(action: str, prompt: str, documents_digest: str, lang: str, model: str) -> str:
+    normalized = " ".join((prompt or "").lower().split())
+    raw = json.dumps([action, normalized, documents_digest, lang, model], ensure_ascii=False)
+    return "edumentor:response:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Model replies for deterministic actions: in-process LRU, optionally backed by Redis so
+    that all workers / replicas share hits."""
+
+    def __init__(self, local: TTLCache, shared=None):
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        try:
+            value = await self.shared.get(key)
+        except Exception:
+            return None  # the shared cache is best effort
+        if value is not None:
+            value = value.decode() if isinstance(value, bytes) else value
+            self.shared_hits += 1
+            self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value, ex=int(self.local.ttl_seconds))
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        return {**self.local.stats(), "shared": self.shared is not None, "shared_hits": self.shared_hits}
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    settings = get_settings()
+    shared = None
+    if settings.RESPONSE_CACHE_REDIS_URL:
+        if aioredis is None:
+            raise RuntimeError("RESPONSE_CACHE_REDIS_URL is set but the 'redis' package is not installed")
+        shared = aioredis.from_url(settings.RESPONSE_CACHE_REDIS_URL)
+    return ResponseCache(TTLCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL_SECONDS), shared)
@@ -0,0 +1,115 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+from ..settings import get_settings
+from .tokens import count_tokens, truncate_tokens
+
+MESSAGE_OVERHEAD = 4  # role / separator tokens the API adds per chat message
+_OMITTED_NOTE = "({} earlier messages of this conversation were omitted to fit the context window.)"
+
+
+@dataclass
+class ContextResult:
+    messages: list[dict]
+    usage: dict[str, int]   # token counts per section, reported back to the client
+    documents_digest: str   # sha256 of the stored text of the documents included (names not part of it)
+
+
+def _fit_documents(documents: list[tuple[str, str]], budget: int) -> tuple[dict[int, str], int]:
+    """Splits `budget` evenly across documents; short documents hand their unused share to longer ones.
+    Returns the excerpts by document index (documents that got no room are absent)."""
+    parts: dict[int, str] = {}
+    used = 0
+    order = sorted(range(len(documents)), key=lambda i: len(documents[i][1]))
+    for pos, i in enumerate(order):
+        name, text = documents[i]
+        header = f"Document '{name}' content (excerpt):\n"
+        share = (budget - used) // (len(order) - pos) - count_tokens(header) - MESSAGE_OVERHEAD
+        if share <= 0:
+            continue
+        excerpt, n = truncate_tokens(text, share)
+        if not excerpt:
+            continue
+        parts[i] = header + excerpt
+        used += n + count_tokens(header) + MESSAGE_OVERHEAD
+    return parts, used
+
+
+def _fit_history(history: list[tuple[str, str]], budget: int) -> tuple[list[dict], int]:
+    """Keeps the most recent whole messages that fit in `budget`."""
+    kept, used = [], 0
+    for role, content in reversed(history):
+        n = count_tokens(content) + MESSAGE_OVERHEAD
+        if used + n > budget:
+            break
+        kept.append({"role": role, "content": content})
+        used += n
+    kept.reverse()
+    return kept, used
+
+
+def assemble_context(
+    system: list[str],
+    documents: list[tuple[str, str]],
+    history: list[tuple[str, str]],
+    prompt: str,
+    *,
+    inline_documents: bool = False,
+    max_tokens: Optional[int] = None,
+) -> ContextResult:
+    """Builds the model message list within CONTEXT_MAX_TOKENS (minus the completion reserve).
+
+    The system prompts and the final prompt are kept first; what remains is shared between
+    documents (CONTEXT_DOCUMENT_SHARE) and recent history, each side lending its unused part
+    to the other. With `inline_documents` the excerpts are appended to the final prompt
+    instead of being sent as separate messages.
+    """
+    settings = get_settings()
+    budget = (max_tokens or settings.CONTEXT_MAX_TOKENS) - settings.CONTEXT_COMPLETION_RESERVE
+
+    system_tokens = sum(count_tokens(s) + MESSAGE_OVERHEAD for s in system)
+    prompt, prompt_tokens = truncate_tokens(prompt, max(budget - system_tokens - MESSAGE_OVERHEAD, 0))
+    prompt_tokens += MESSAGE_OVERHEAD
+    available = max(budget - system_tokens - prompt_tokens, 0)
+
+    # History first measures what it needs within its own share, documents get the rest,
+    # then history is refitted against whatever the documents left over.
+    doc_share = int(available * settings.CONTEXT_DOCUMENT_SHARE) if documents else 0
+    _, history_need = _fit_history(history, available - doc_share)
+    fitted, doc_tokens = _fit_documents(documents, available - history_need)
+    included = sorted(fitted)
+    doc_parts = [fitted[i] for i in included]
+    history_msgs, history_tokens = _fit_history(history, available - doc_tokens)
+    note_tokens = 0
+    if len(history_msgs) < len(history):
+        # Make room for the omission note (sized for the worst case) and refit
+        note_tokens = count_tokens(_OMITTED_NOTE.format(len(history))) + MESSAGE_OVERHEAD
+        history_msgs, history_tokens = _fit_history(history, available - doc_tokens - note_tokens)
+
+    omitted = len(history) - len(history_msgs)
+    messages = [{"role": "system", "content": s} for s in system]
+    if inline_documents:
+        if doc_parts:
+            prompt = prompt + "\n\nDocuments content:\n" + "\n\n".join(doc_parts)
+    else:
+        messages.extend({"role": "user", "content": p} for p in doc_parts)
+    if omitted:
+        messages.append({"role": "system", "content": _OMITTED_NOTE.format(omitted)})
+        system_tokens += note_tokens
+    messages.extend(history_msgs)
+    messages.append({"role": "user", "content": prompt})
+
+    usage = {
+        "system": system_tokens,
+        "documents": doc_tokens,
+        "history": history_tokens,
+        "prompt": prompt_tokens,
+        "total": system_tokens + doc_tokens + history_tokens + prompt_tokens,
+        "budget": budget,
+        "history_omitted": omitted,
+    }
+    # Keyed on what was stored, not on the rendered excerpts: those carry the file name in their
+    # header, so the same material uploaded under another name would never share a cached reply.
+    digest = hashlib.sha256("\0".join(documents[i][1] for i in included).encode()).hexdigest()
+    return ContextResult(messages=messages, usage=usage, documents_digest=digest)
@@ -1,31 +1,124 @@
-import io
+import os
+import threading
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Optional, TextIO
 import PyPDF2
 import docx
-from fastapi import UploadFile
 
-def extract_text_from_file(file: UploadFile) -> str:
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+def is_supported(filename: Optional[str]) -> bool:
+    return (filename or "").lower().endswith(SUPPORTED_EXTENSIONS)
+
+def _extract(fileobj, filename: str) -> tuple[str, Optional[int]]:
+    """Returns (text, page_count); page_count is only known for PDFs."""
     try:
-        filename = file.filename.lower()
-        file.file.seek(0)  # Ensure reading from start
+        filename = filename.lower()
 
         if filename.endswith(".pdf"):
-            reader = PyPDF2.PdfReader(file.file)
-            return "\n".join([page.extract_text() or "" for page in reader.pages])
+            reader = PyPDF2.PdfReader(fileobj)
+            return "\n".join([page.extract_text() or "" for page in reader.pages]), len(reader.pages)
 
         elif filename.endswith(".docx"):
-            bio = io.BytesIO(file.file.read())
-            doc = docx.Document(bio)
-            return "\n".join([p.text for p in doc.paragraphs])
+            doc = docx.Document(fileobj)  # reads the zip straight from the (seekable) file
+            return "\n".join([p.text for p in doc.paragraphs]), None
 
         elif filename.endswith(".txt"):
-            content = file.file.read().decode("utf-8", errors="ignore")
-            return f"Beginning of a single file {{ {content} }} end of a single file"
+            content = fileobj.read().decode("utf-8", errors="ignore")
+            return f"Beginning of a single file {{ {content} }} end of a single file", None
 
         else:
-            return ""
+            return "", None
     except Exception as e:
         print(f"Error: {e}")
-        return ""
+        return "", None
+
+def extract_document_from_path(path: str, filename: str) -> tuple[str, Optional[int]]:
+    """Module-level so it can run in a worker process (see backend.ingest)."""
+    with open(path, "rb") as f:
+        return _extract(f, filename)
+
+# ---------- Page-level PDF extraction ----------
+# Large PDFs are split into page ranges that worker processes extract independently
+# (see backend.ingest); each worker opens the file itself so only paths cross processes.
+
+PAGE_SEPARATOR = "\n"
+
+_open_pdf = threading.local()
+
+def _pdf_reader(path: str) -> PyPDF2.PdfReader:
+    """The reader of the last PDF this process (thread) worked on. Parsing a PDF's structure costs about
+    as much as extracting a hundred pages, so it is done once per process rather than once per range.
+    The file stays open until the next one is read (removing it meanwhile is fine on POSIX)."""
+    key = (path, os.stat(path).st_mtime_ns)
+    if getattr(_open_pdf, "key", None) != key:
+        if getattr(_open_pdf, "file", None) is not None:
+            _open_pdf.file.close()
+        _open_pdf.file = open(path, "rb")
+        _open_pdf.key, _open_pdf.reader = key, PyPDF2.PdfReader(_open_pdf.file)
+    return _open_pdf.reader
+
+def pdf_page_count(path: str) -> int:
+    return len(_pdf_reader(path).pages)
+
+def page_ranges(page_count: int, pages_per_task: int) -> list[tuple[int, int]]:
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+def extract_pdf_pages(path: str, start: int, end: int) -> list[str]:
+    """Text of pages [start, end); a page that fails to parse yields an empty string."""
+    reader = _pdf_reader(path)
+    pages = []
+    for i in range(start, min(end, len(reader.pages))):
+        try:
+            pages.append(reader.pages[i].extract_text() or "")
+        except Exception as e:
+            print(f"Error on page {i + 1}: {e}")
+            pages.append("")
+    return pages
+
+def extract_pdf_parallel(
+    pool: Executor,
+    path: str,
+    out: TextIO,
+    pages_per_task: int,
+    window: int,
+    wait: Callable[[Future], Any] = Future.result,
+    on_range: Optional[Callable[[int, int], None]] = None,
+) -> tuple[int, list[int]]:
+    """Extracts a PDF over `pool` in page ranges and writes the text to `out` in page order, each range as
+    soon as it and those before it are done. At most `window` ranges are in flight, so finished text
+    does not pile up in memory. Returns (page_count, offsets) where offsets[i] is where page i+1 starts.
+
+    `wait` collects a task's result (e.g. renewing a lease meanwhile); `on_range(end, page_count)` is
+    called after each range is written.
+    """
+    page_count = wait(pool.submit(pdf_page_count, path))
+    ranges = page_ranges(page_count, pages_per_task)
+    in_flight: deque[Future] = deque()
+    offsets, pos = [], 0
+    try:
+        for i, (_, end) in enumerate(ranges):
+            for start_, end_ in ranges[i + len(in_flight):i + window]:
+                in_flight.append(pool.submit(extract_pdf_pages, path, start_, end_))
+            for page in wait(in_flight.popleft()):
+                if offsets:
+                    out.write(PAGE_SEPARATOR)
+                    pos += len(PAGE_SEPARATOR)
+                offsets.append(pos)
+                out.write(page)
+                pos += len(page)
+            if on_range:
+                on_range(end, page_count)
+    finally:
+        for future in in_flight:  # interrupted: drop queued ranges
+            future.cancel()
+    return page_count, offsets
+
+def page_at(offsets: list[int], pos: int) -> int:
+    """1-based page number containing character position pos."""
+    return bisect_right(offsets, pos) or 1
 
 
 # def extract_text_from_file(file: UploadFile) -> str:
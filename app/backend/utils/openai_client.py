@@ -1,13 +1,19 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from ..settings import get_settings
 
 _settings = get_settings()
-client = OpenAI(api_key=_settings.OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=_settings.OPENAI_API_KEY, base_url=_settings.OPENAI_BASE_URL)
 
-def generate_title(prompt: str) -> str:
+def heuristic_title(prompt: str) -> str:
+    s = (prompt or "").strip()
+    if not s:
+        return "New Session"
+    return " ".join(s.split()[:6])
+
+async def generate_title(prompt: str) -> str:
     try:
-        res = client.chat.completions.create(
-            model="gpt-4o-mini",
+        res = await async_client.chat.completions.create(
+            model=_settings.OPENAI_CHAT_MODEL,
             messages=[
                 {"role": "system", "content": "Generate a short (3–5 words) title summarizing the topic of this text. Or generate the title based on the action. Only return the title."},
                 {"role": "user", "content": prompt},
@@ -19,19 +25,30 @@ def generate_title(prompt: str) -> str:
         parts = title.split()
         return " ".join(parts[:10]) if len(parts) > 10 else title
     except Exception:
-        s = (prompt or "").strip()
-        if not s:
-            return "New Session"
-        return " ".join(s.split()[:6])
+        return heuristic_title(prompt)
 
 def detect_language_simple(text: str) -> str:
     if any("\u0600" <= ch <= "\u06FF" or "\u0750" <= ch <= "\u077F" for ch in text):
         return "ar"
     return "en"
 
-def chat(messages):
-    res = client.chat.completions.create(
-        model="gpt-4o-mini",
+async def chat(messages):
+    res = await async_client.chat.completions.create(
+        model=_settings.OPENAI_CHAT_MODEL,
         messages=messages
     )
     return res.choices[0].message.content
+
+async def chat_stream(messages):
+    """Yields the completion text piece by piece as the model produces it."""
+    stream = await async_client.chat.completions.create(
+        model=_settings.OPENAI_CHAT_MODEL,
+        messages=messages,
+        stream=True
+    )
+    # Closed on every exit, including the client going away mid-reply (the generator is closed
+    # then); the response is otherwise only released once fully read, and the completion runs on
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -0,0 +1,215 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Protocol
+from uuid import UUID, uuid4
+
+from sqlalchemy.orm import Session
+
+from ..models import Document, DocumentChunk
+from ..settings import get_settings
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were what when "
+    "where which who why will with you your".split()
+)
+
+
+# ---------- Chunking ----------
+def split_into_chunks(text: str, max_chars: Optional[int] = None, overlap: Optional[int] = None) -> list[str]:
+    """Splits text into ~max_chars pieces, preferring paragraph, then sentence, then word boundaries."""
+    settings = get_settings()
+    max_chars = max_chars or settings.CHUNK_CHARS
+    overlap = settings.CHUNK_OVERLAP_CHARS if overlap is None else overlap
+    text = (text or "").strip()
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            window = text[start:end]
+            for sep in ("\n\n", "\n", ". ", " "):
+                cut = window.rfind(sep)
+                if cut > max_chars // 2:
+                    end = start + cut + len(sep)
+                    break
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append(piece)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def add_document_chunks(db: Session, text: str, *, document_id: Optional[UUID] = None,
+                        blob_sha256: Optional[str] = None) -> list[str]:
+    """Stores the chunks of a blob (or of a legacy document) without committing, and returns them."""
+    chunks = split_into_chunks(text)
+    db.add_all(
+        DocumentChunk(id=uuid4(), document_id=document_id, blob_sha256=blob_sha256, ordinal=i, content=c)
+        for i, c in enumerate(chunks)
+    )
+    return chunks
+
+
+# ---------- Index ----------
+@dataclass
+class Chunk:
+    document_id: UUID
+    filename: str
+    ordinal: int
+    content: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.filename}, part {self.ordinal + 1}"
+
+
+class EmbeddingBackend(Protocol):
+    def embed(self, texts: list[str]) -> list[list[float]]: ...
+
+
+_embedding_backend: Optional[EmbeddingBackend] = None
+
+
+def set_embedding_backend(backend: Optional[EmbeddingBackend]) -> None:
+    """Plugs in a dense embedding model; search then blends cosine similarity with BM25."""
+    global _embedding_backend
+    _embedding_backend = backend
+    _index_cache.clear()
+
+
+def _terms(text: str) -> list[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if len(w) > 1 and w not in _STOPWORDS]
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class BM25Index:
+    def __init__(self, chunks: list[Chunk], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1, self.b = k1, b
+        self._tf = [Counter(_terms(c.content)) for c in chunks]
+        self._len = [sum(tf.values()) for tf in self._tf]
+        self._avg_len = (sum(self._len) / len(chunks)) if chunks else 0.0
+        df = Counter(t for tf in self._tf for t in tf)
+        n = len(chunks)
+        self._idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+        self._embedding_backend = _embedding_backend
+        self._vectors = self._embedding_backend.embed([c.content for c in chunks]) if self._embedding_backend and chunks else None
+
+    def _bm25(self, terms: list[str]) -> list[float]:
+        scores = []
+        for tf, length in zip(self._tf, self._len):
+            s = 0.0
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    s += self._idf[t] * f * (self.k1 + 1) / (f + self.k1 * (1 - self.b + self.b * length / (self._avg_len or 1)))
+            scores.append(s)
+        return scores
+
+    def search(self, query: str, k: int) -> list[Chunk]:
+        """Top-k chunks for the query, returned in reading order. Falls back to `spread` when nothing matches."""
+        scores = self._bm25(_terms(query))
+        if self._vectors is not None:
+            top = max(scores) or 1.0
+            qv = self._embedding_backend.embed([query])[0]
+            scores = [0.5 * s / top + 0.5 * _cosine(qv, v) for s, v in zip(scores, self._vectors)]
+        ranked = [i for i in sorted(range(len(scores)), key=lambda i: -scores[i]) if scores[i] > 0][:k]
+        if not ranked:
+            return self.spread(k)
+        return [self.chunks[i] for i in sorted(ranked)]
+
+    def spread(self, k: int) -> list[Chunk]:
+        """k chunks evenly spaced through every document, for query-less actions (summaries, quizzes)."""
+        by_doc: OrderedDict[UUID, list[int]] = OrderedDict()
+        for i, c in enumerate(self.chunks):
+            by_doc.setdefault(c.document_id, []).append(i)
+        picked = []
+        for pos, idxs in enumerate(by_doc.values()):
+            m = k // len(by_doc) + (1 if pos < k % len(by_doc) else 0)
+            if m <= 0:
+                continue
+            if m >= len(idxs):
+                picked.extend(idxs)
+            else:
+                step = (len(idxs) - 1) / max(m - 1, 1)
+                picked.extend(sorted({idxs[round(j * step)] for j in range(m)}))
+        return [self.chunks[i] for i in picked]
+
+
+# Per-session index cache, keyed by the session's document ids so uploads invalidate it
+_index_cache: OrderedDict[UUID, tuple[tuple, BM25Index]] = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def get_session_index(db: Session, session_id: UUID) -> BM25Index:
+    docs = (
+        db.query(Document.id, Document.filename, Document.blob_sha256)
+        .filter(Document.session_id == session_id, Document.status == "ready")
+        .order_by(Document.id)
+        .all()
+    )
+    key = tuple(d.id for d in docs)
+    with _index_lock:
+        cached = _index_cache.get(session_id)
+        if cached and cached[0] == key:
+            _index_cache.move_to_end(session_id)
+            return cached[1]
+
+    names = {d.id: d.filename for d in docs}
+    by_doc: dict[UUID, list[Chunk]] = {doc_id: [] for doc_id in key}
+    # A file uploaded twice into one session shares a blob, so fan blob chunks out per document
+    by_blob: dict[str, list[UUID]] = {}
+    for d in docs:
+        if d.blob_sha256:
+            by_blob.setdefault(d.blob_sha256, []).append(d.id)
+    legacy = [d.id for d in docs if not d.blob_sha256]
+    if by_blob:
+        rows = (
+            db.query(DocumentChunk.blob_sha256, DocumentChunk.ordinal, DocumentChunk.content)
+            .filter(DocumentChunk.blob_sha256.in_(list(by_blob)))
+            .order_by(DocumentChunk.blob_sha256, DocumentChunk.ordinal)
+            .all()
+        )
+        for r in rows:
+            for doc_id in by_blob[r.blob_sha256]:
+                by_doc[doc_id].append(Chunk(doc_id, names[doc_id], r.ordinal, r.content))
+    if legacy:
+        rows = (
+            db.query(DocumentChunk.document_id, DocumentChunk.ordinal, DocumentChunk.content)
+            .filter(DocumentChunk.document_id.in_(legacy))
+            .order_by(DocumentChunk.document_id, DocumentChunk.ordinal)
+            .all()
+        )
+        for r in rows:
+            by_doc[r.document_id].append(Chunk(r.document_id, names[r.document_id], r.ordinal, r.content))
+    # Documents uploaded before chunking existed are chunked on first use
+    missing = [doc_id for doc_id in legacy if not by_doc[doc_id]]
+    if missing:
+        for d in db.query(Document.id, Document.content).filter(Document.id.in_(missing)).all():
+            chunks = add_document_chunks(db, d.content or "", document_id=d.id)
+            by_doc[d.id] = [Chunk(d.id, names[d.id], i, c) for i, c in enumerate(chunks)]
+        db.flush()
+
+    index = BM25Index([c for chunks in by_doc.values() for c in chunks])
+    with _index_lock:
+        _index_cache[session_id] = (key, index)
+        _index_cache.move_to_end(session_id)
+        while len(_index_cache) > get_settings().RETRIEVAL_INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def retrieve_chunks(db: Session, session_id: UUID, query: Optional[str], k: Optional[int] = None) -> list[Chunk]:
+    index = get_session_index(db, session_id)
+    k = k or get_settings().RETRIEVAL_TOP_K
+    return index.search(query, k) if query and query.strip() else index.spread(k)
@@ -0,0 +1,31 @@
+import re
+from math import ceil
+
+# Local, dependency-free token estimate close to the BPE tokenizers used by the chat models:
+# each punctuation mark is one token, ASCII words cost one token per ~6 characters and
+# non-ASCII words (Arabic, ...) one per ~3, since those split into many more pieces.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+ASCII_CHARS_PER_TOKEN = 6
+OTHER_CHARS_PER_TOKEN = 3
+
+
+def _piece_tokens(piece: str) -> int:
+    per_token = ASCII_CHARS_PER_TOKEN if piece.isascii() else OTHER_CHARS_PER_TOKEN
+    return ceil(len(piece) / per_token)
+
+
+def count_tokens(text: str) -> int:
+    return sum(_piece_tokens(m.group(0)) for m in _TOKEN_RE.finditer(text or ""))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> tuple[str, int]:
+    """Returns the longest prefix of `text` that fits in `max_tokens`, and its token count.
+    Stops scanning as soon as the budget is reached, so huge inputs are never fully tokenized."""
+    used, end = 0, 0
+    for m in _TOKEN_RE.finditer(text or ""):
+        n = _piece_tokens(m.group(0))
+        if used + n > max_tokens:
+            return text[:end], used
+        used += n
+        end = m.end()
+    return text or "", used
@@ -0,0 +1,85 @@
+import asyncio
+import io
+import wave
+from typing import AsyncIterator, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .openai_client import async_client
+from ..settings import get_settings
+
+# Requests in flight to the transcription API across all uploads in this process, so a burst
+# of voice notes queues here instead of tripping provider rate limits.
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(get_settings().TRANSCRIBE_CONCURRENCY)
+    return _slots
+
+
+def wav_segments(path: str, seconds: float) -> list[tuple[int, int]]:
+    """Frame ranges of about `seconds` each; [] when the file is not a PCM WAV we can split."""
+    try:
+        with wave.open(path, "rb") as w:
+            rate, total = w.getframerate(), w.getnframes()
+    except (wave.Error, EOFError):
+        return []
+    step = max(int(rate * seconds), 1)
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+
+def read_wav_segment(path: str, start: int, end: int) -> bytes:
+    """Frames [start, end) as a standalone WAV file in memory."""
+    buf = io.BytesIO()
+    with wave.open(path, "rb") as src, wave.open(buf, "wb") as dst:
+        dst.setparams(src.getparams())
+        src.setpos(start)
+        dst.writeframes(src.readframes(end - start))
+    return buf.getvalue()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def _transcribe(name: str, load: Callable[[], bytes], lang: str) -> str:
+    async with _get_slots():
+        # Loaded only once a slot is free, so at most TRANSCRIBE_CONCURRENCY buffers are held
+        data = await run_in_threadpool(load)
+        res = await async_client.audio.transcriptions.create(
+            model=get_settings().TRANSCRIBE_MODEL,
+            file=(name, data),
+            language=lang,
+        )
+    return (res.text or "").strip()
+
+
+async def transcribe_stream(path: str, filename: str, lang: str) -> AsyncIterator[str]:
+    """Yields the transcript of an audio file piece by piece, in order.
+
+    WAV recordings longer than TRANSCRIBE_SEGMENT_SECONDS are split into segments that are
+    transcribed concurrently; other formats are sent as a single request.
+    """
+    segments = await run_in_threadpool(wav_segments, path, get_settings().TRANSCRIBE_SEGMENT_SECONDS)
+    if len(segments) <= 1:
+        yield await _transcribe(filename, lambda: _read_file(path), lang)
+        return
+
+    tasks = [
+        asyncio.create_task(_transcribe(f"part-{i}.wav", lambda s=start, e=end: read_wav_segment(path, s, e), lang))
+        for i, (start, end) in enumerate(segments)
+    ]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def transcribe_file(path: str, filename: str, lang: str) -> str:
+    return " ".join([part async for part in transcribe_stream(path, filename, lang) if part])
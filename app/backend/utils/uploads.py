@@ -0,0 +1,192 @@
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from ..settings import get_settings
+
+# Headroom for multipart boundaries and form fields around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+# Plain form fields are held in memory; nothing the routes accept comes close
+MAX_FIELD_BYTES = 1024 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File is larger than {max_bytes // (1024 * 1024)} MB")
+
+
+@dataclass
+class ReceivedFile:
+    filename: str
+    path: str
+    sha256: str
+    size: int
+
+
+@dataclass
+class ReceivedForm:
+    fields: dict[str, str] = field(default_factory=dict)
+    file: Optional[ReceivedFile] = None
+
+
+class _FormReceiver:
+    """python-multipart callbacks: the file part goes to disk, other parts to `fields`.
+
+    File bytes are buffered up to UPLOAD_CHUNK_BYTES and written by `flush` (blocking, run it in the
+    threadpool between parser writes), so memory use is one chunk regardless of file size.
+    """
+
+    def __init__(self, file_field: str, file_path: Callable[[str], str], max_bytes: int):
+        self.file_field, self.file_path, self.max_bytes = file_field, file_path, max_bytes
+        self.chunk_bytes = get_settings().UPLOAD_CHUNK_BYTES
+        self.form = ReceivedForm()
+        self.out = None
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.pending: list[bytes] = []
+        self.pending_bytes = 0
+        self._header_field = self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._name: Optional[str] = None
+        self._value = bytearray()
+        self._writing = False
+
+    @property
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._on_header(field=data[start:end]),
+            "on_header_value": lambda data, start, end: self._on_header(value=data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers.clear()
+        self._name, self._value, self._writing = None, bytearray(), False
+
+    def _on_header(self, field: bytes = b"", value: bytes = b""):
+        self._header_field += field
+        self._header_value += value
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+        if name == self.file_field and filename and self.out is None:
+            filename = os.path.basename(filename.decode("utf-8", errors="replace"))
+            path = self.file_path(filename)
+            self.out = open(path, "wb")
+            self.form.file = ReceivedFile(filename=filename, path=path, sha256="", size=0)
+            self._writing = True
+        else:
+            self._name = name
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._writing:
+            self.size += end - start
+            if self.size > self.max_bytes:
+                raise _too_large(self.max_bytes)
+            chunk = data[start:end]
+            self.hash.update(chunk)
+            self.pending.append(chunk)
+            self.pending_bytes += len(chunk)
+        elif self._name is not None:
+            self._value += data[start:end]
+            if len(self._value) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Form field '{self._name}' is too large")
+
+    def on_part_end(self):
+        if self._writing:
+            self._writing = False
+            self.form.file.sha256, self.form.file.size = self.hash.hexdigest(), self.size
+        elif self._name is not None:
+            self.form.fields[self._name] = self._value.decode("utf-8", errors="replace")
+
+    def flush(self, force: bool = False):
+        if self.out is not None and self.pending and (force or self.pending_bytes >= self.chunk_bytes):
+            self.out.write(b"".join(self.pending))
+            self.pending.clear()
+            self.pending_bytes = 0
+
+    def close(self):
+        if self.out is not None:
+            self.out.close()
+
+
+async def receive_form(request: Request, file_path: Callable[[str], str], max_bytes: int,
+                       file_field: str = "file") -> ReceivedForm:
+    """Reads a form request body as it arrives, writing the `file_field` part straight to
+    `file_path(filename)` and hashing it on the way (one copy on disk, one chunk in memory).
+
+    Raises 413 and removes the partial file as soon as the file exceeds max_bytes, whether or not the
+    request declared a Content-Length. `file_path` may raise (e.g. 400 for an unsupported type) before
+    anything is written. Non-multipart forms (text-only uploads) are read the usual way.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        form = await request.form()
+        return ReceivedForm(fields={k: v for k, v in form.items() if isinstance(v, str)})
+    if b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Missing multipart boundary")
+
+    receiver = _FormReceiver(file_field, file_path, max_bytes)
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks)
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await run_in_threadpool(receiver.flush)
+        parser.finalize()
+        await run_in_threadpool(receiver.flush, True)
+    except BaseException:
+        receiver.close()
+        if receiver.form.file is not None and os.path.exists(receiver.form.file.path):
+            os.remove(receiver.form.file.path)
+        raise
+    receiver.close()
+    return receiver.form
+
+
+def form_schema(**fields: str) -> dict:
+    """OpenAPI requestBody for routes that read their form with receive_form: {name: "file" | "string"}."""
+    properties = {name: {"type": "string", "format": "binary"} if kind == "file" else {"type": "string"}
+                  for name, kind in fields.items()}
+    return {"requestBody": {"content": {"multipart/form-data": {"schema": {"type": "object", "properties": properties}}}}}
+
+
+def _limit_for(path: str) -> Optional[int]:
+    settings = get_settings()
+    if path.endswith("/upload"):
+        return settings.MAX_UPLOAD_BYTES
+    if path.endswith(("/transcribe", "/transcribe/stream")):
+        return settings.MAX_AUDIO_BYTES
+    return None
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized upload requests from their Content-Length header, before any of the body is
+    read. Chunked requests without a length are still capped by receive_form as the bytes arrive."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = _limit_for(scope["path"])
+            length = dict(scope["headers"]).get(b"content-length")
+            if limit is not None and length and length.isdigit() and int(length) > limit + MULTIPART_OVERHEAD:
+                response = JSONResponse({"detail": f"File is larger than {limit // (1024 * 1024)} MB"}, status_code=413)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
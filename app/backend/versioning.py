@@ -0,0 +1,55 @@
+from itertools import chain
+from typing import Iterable
+from uuid import UUID
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .models import Session as DBSession, Document, Message
+
+# Session.version changes exactly when something GET /session/{sid} returns changes (name,
+# messages, documents and their status), so clients can keep what they have while it matches.
+# ORM writes are picked up by the flush hook below; bulk UPDATEs call bump() themselves.
+
+
+def bump(db: OrmSession, session_ids: Iterable[UUID]) -> dict[UUID, int]:
+    ids = {i for i in session_ids if i is not None}
+    if not ids:
+        return {}
+    rows = db.execute(
+        update(DBSession)
+        .where(DBSession.id.in_(ids))
+        .values(version=DBSession.version + 1)
+        .returning(DBSession.id, DBSession.version)
+        .execution_options(synchronize_session=False)
+    ).all()
+    versions = dict(rows)
+    # Keep loaded Session objects current without marking them dirty
+    for obj in db.identity_map.values():
+        if isinstance(obj, DBSession) and obj.id in versions:
+            set_committed_value(obj, "version", versions[obj.id])
+    return versions
+
+
+def bump_for_document(db: OrmSession, document_id: UUID) -> None:
+    bump(db, db.execute(select(Document.session_id).where(Document.id == document_id)).scalars())
+
+
+def _owner_id(obj):
+    if obj.session_id is not None:
+        return obj.session_id
+    return obj.session.id if obj.session is not None else None  # appended via Session.messages, not flushed yet
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _bump_on_flush(db: OrmSession, flush_context, instances) -> None:
+    touched = set()
+    for obj in chain(db.new, db.dirty, db.deleted):
+        if isinstance(obj, (Message, Document)):
+            touched.add(_owner_id(obj))
+        elif isinstance(obj, DBSession) and obj in db.dirty and db.is_modified(obj, include_collections=False):
+            touched.add(obj.id)
+    # A session created in this flush starts at version 1
+    touched -= {obj.id for obj in db.new if isinstance(obj, DBSession)}
+    bump(db, touched)
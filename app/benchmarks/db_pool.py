@@ -0,0 +1,102 @@
+"""Session reads under 10/50/200 concurrent users, to size the connection pool.
+
+    cd app && DATABASE_URL=postgresql+psycopg://... python -m benchmarks.db_pool [--users 10 50 200] [--seconds 10]
+
+Each simulated user loops over GET /session/list and GET /session/{sid} against the app in this
+process (over ASGI, so the numbers are the app and its pool, not the network). The pool is
+configured as in production, from DB_POOL_* / DB_PGBOUNCER; run it once per setting to compare.
+The database must be migrated; the benchmark's user and sessions are removed afterwards.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from uuid import uuid4
+
+import httpx
+
+from backend.database import SessionLocal, engine, pool_stats
+from backend.deps import CurrentUser, get_current_user
+from backend.main import app
+from backend.models import Message, Session as DBSession, User
+
+SESSIONS = 20
+MESSAGES_PER_SESSION = 40
+
+
+def seed() -> tuple[CurrentUser, list[str]]:
+    with SessionLocal() as db:
+        user = User(id=uuid4(), email=f"bench-{uuid4().hex}@example.com", name="Bench", hashed_password="x", provider="local")
+        db.add(user)
+        sids = []
+        for s in range(SESSIONS):
+            session = DBSession(id=uuid4(), user_id=user.id, name=f"Session {s}")
+            db.add(session)
+            db.add_all(Message(id=uuid4(), session_id=session.id, role="user" if i % 2 == 0 else "assistant",
+                               type="chat", content=f"message {i}") for i in range(MESSAGES_PER_SESSION))
+            sids.append(str(session.id))
+        db.commit()
+        return CurrentUser.from_user(user), sids
+
+
+def cleanup(user_id) -> None:
+    with SessionLocal() as db:
+        db.query(User).filter(User.id == user_id).delete()
+        db.commit()
+
+
+async def run(users: int, seconds: float, sids: list[str]) -> dict:
+    latencies, statuses, peak = [], {}, {"checked_out": 0}
+    deadline = time.monotonic() + seconds
+
+    async def user(n: int, client: httpx.AsyncClient):
+        i = n
+        while time.monotonic() < deadline:
+            url = "/session/list" if i % 4 == 0 else f"/session/{sids[i % len(sids)]}"
+            start = time.perf_counter()
+            r = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+            i += 1
+
+    async def watch_pool():
+        while time.monotonic() < deadline:
+            peak["checked_out"] = max(peak["checked_out"], pool_stats().get("checked_out", 0))
+            await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+        await asyncio.gather(watch_pool(), *(user(n, client) for n in range(users)))
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / seconds,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "statuses": statuses,
+        "peak_checked_out": peak["checked_out"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    current_user, sids = seed()
+    app.dependency_overrides[get_current_user] = lambda: current_user
+    try:
+        print(f"pool: {pool_stats()}")
+        print(f"{'users':>6} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak conns':>10}  statuses")
+        for users in args.users:
+            r = asyncio.run(run(users, args.seconds, sids))
+            print(f"{users:>6} {r['requests']:>9} {r['rps']:>8.0f} {r['p50'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f} "
+                  f"{r['peak_checked_out']:>10}  {r['statuses']}")
+    finally:
+        app.dependency_overrides.clear()
+        cleanup(current_user.id)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
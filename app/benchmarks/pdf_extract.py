@@ -0,0 +1,73 @@
+"""PDF extraction: serial vs page ranges over a process pool, on 50/500/2000-page fixtures.
+
+    cd app && python -m benchmarks.pdf_extract [--pages 50 500 2000] [--processes 1 2 4 8]
+
+Fixtures are generated once (needs `fpdf`) under the temp directory. The pool is started and warmed
+up before timing, as it is in a running API worker. Speedup is relative to one extraction process.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from backend.utils.file_extract import extract_document_from_path, extract_pdf_parallel, pdf_page_count
+
+FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "edumentor-bench")
+LINES_PER_PAGE = 30
+
+
+def fixture(pages: int) -> str:
+    path = os.path.join(FIXTURE_DIR, f"fixture-{pages}.pdf")
+    if not os.path.exists(path):
+        from fpdf import FPDF
+        os.makedirs(FIXTURE_DIR, exist_ok=True)
+        pdf = FPDF()
+        pdf.set_font("Arial", size=9)
+        for p in range(pages):
+            pdf.add_page()
+            for line in range(LINES_PER_PAGE):
+                pdf.cell(0, 8, txt=f"Page {p + 1}, line {line + 1}: cells divide by mitosis and meiosis.", ln=1)
+        pdf.output(path)
+    return path
+
+
+def time_serial(path: str) -> float:
+    start = time.perf_counter()
+    extract_document_from_path(path, path)
+    return time.perf_counter() - start
+
+
+def time_parallel(path: str, processes: int, pages_per_task: int) -> float:
+    with ProcessPoolExecutor(max_workers=processes, mp_context=get_context("spawn")) as pool:
+        list(pool.map(pdf_page_count, [fixture(1)] * processes))   # start every worker (on another file)
+        with tempfile.TemporaryFile("w+", encoding="utf-8", newline="") as out:
+            start = time.perf_counter()
+            extract_pdf_parallel(pool, path, out, pages_per_task, window=2 * processes)
+            return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({1, 2, 4, 8, os.cpu_count() or 1} & set(range(1, (os.cpu_count() or 1) + 1))))
+    parser.add_argument("--pages-per-task", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.pages_per_task} pages per task")
+    print(f"{'pages':>6} {'mode':>12} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+    for pages in args.pages:
+        path = fixture(pages)
+        serial = time_serial(path)
+        print(f"{pages:>6} {'serial':>12} {serial:>9.2f} {pages / serial:>9.0f} {'':>8}")
+        base = None
+        for processes in args.processes:
+            seconds = time_parallel(path, processes, args.pages_per_task)
+            base = base or seconds
+            print(f"{pages:>6} {f'{processes} processes':>12} {seconds:>9.2f} {pages / seconds:>9.0f} {base / seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
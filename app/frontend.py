@@ -6,6 +6,8 @@ Make sure backend is running at http://localhost:8000
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from streamlit.components.v1 import html as st_html
 #import streamlit.components.v1 as components
 import hashlib
@@ -13,6 +15,8 @@ import re, json
 import time
 from typing import Optional
 import os
+import logging
+from collections import deque
 from fpdf import FPDF
 import base64
 
@@ -20,6 +24,11 @@ import base64
 #BACKEND_BASE = "http://localhost:8000"
 # BACKEND_BASE = "http://api:5000"
 BACKEND_BASE = os.getenv("BACKEND_BASE_URL", "http://api:5000")
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "50"))             # keep-alive connections to the backend
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "120"))     # model replies can take a while
+DOCUMENT_WAIT_SECONDS = float(os.getenv("DOCUMENT_WAIT_SECONDS", "600"))  # give up polling an upload after this
+logger = logging.getLogger("edumentor.frontend")
 st.set_page_config(page_title="EduMentorAI", layout="wide", initial_sidebar_state="auto")
 
 # ---------- Sidebar: sessions + language ----------
@@ -44,14 +53,43 @@ def clear_auth():
 def get_token() -> Optional[str]:
     return st.session_state.get("token")
 
+@st.cache_resource
+def get_http() -> requests.Session:
+    """One pooled keep-alive client per Streamlit server process, shared by every browser session.
+    Holds no per-user state: the token is sent per request and the backend sets no cookies."""
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}),  # never replay a POST
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    http = requests.Session()
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    return http
+
+def record_timing(method: str, path: str, status: int, elapsed_ms: float):
+    """Per-call latency: logged, and the last 100 calls kept in st.session_state["api_timings"]."""
+    logger.info("%s %s -> %s in %.1f ms", method, path, status, elapsed_ms)
+    st.session_state.setdefault("api_timings", deque(maxlen=100)).append(
+        {"method": method, "path": path, "status": status, "ms": round(elapsed_ms, 1)}
+    )
+
 def api_request(method: str, path: str, **kwargs):
     """Calls the FastAPI backend and automatically attaches Bearer token if present."""
     headers = kwargs.pop("headers", {})
     token = get_token()
     if token:
         headers["Authorization"] = f"Bearer {token}"
+    kwargs.setdefault("timeout", (API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
     url = f"{BACKEND_BASE.rstrip('/')}/{path.lstrip('/')}"
-    resp = requests.request(method, url, headers=headers, **kwargs)
+    started = time.perf_counter()
+    resp = get_http().request(method, url, headers=headers, **kwargs)
+    # for stream=True this is the time to the response headers
+    record_timing(method, path, resp.status_code, (time.perf_counter() - started) * 1000)
     # Raise nice error for debugging
     if not resp.ok:
         try:
@@ -309,12 +347,78 @@ with st.sidebar:
 
 
 # --- Sessions helper using the authorized client ---
+# --- Per-user read cache ---
+# Entries are keyed by (token, key) and tagged with the backend's session versions, which only
+# change on writes; a rerun reuses them until /session/versions reports something different.
+def cache_get(key, version):
+    entry = st.session_state.setdefault("api_cache", {}).get((get_token(), key))
+    return entry["data"] if entry and entry["version"] == version else None
+
+def cache_put(key, version, data, etag=None):
+    st.session_state.setdefault("api_cache", {})[(get_token(), key)] = {"version": version, "data": data, "etag": etag}
+
+def load_session_versions() -> dict:
+    try:
+        versions = api_request("GET", "/session/versions").json()
+    except Exception:
+        versions = {}
+    st.session_state["session_versions"] = versions
+    return versions
+
+SESSIONS_PAGE_SIZE = 30
+
 def load_sessions():
+    """Sidebar listing: lean mode (no messages), one keyset page more per "Load more" click."""
+    versions = load_session_versions()
+    pages = st.session_state.get("session_pages", 1)
+    cached = cache_get(("sessions", pages), versions)
+    if cached is not None and versions:
+        st.session_state["sessions_more"] = cached["more"]
+        return cached["sessions"]
     try:
-        return api_request("GET", "/session/list").json()
+        sessions, params, next_cursor = [], {"lean": "true", "limit": SESSIONS_PAGE_SIZE}, None
+        for _ in range(pages):
+            resp = api_request("GET", "/session/list", params=params)
+            sessions.extend(resp.json())
+            next_cursor = resp.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params["cursor"] = next_cursor
+        st.session_state["sessions_more"] = bool(next_cursor)
+        cache_put(("sessions", pages), versions, {"sessions": sessions, "more": bool(next_cursor)})
+        return sessions
     except Exception:
         return []
 
+def fetch_session(sid):
+    """GET /session/{sid}, reused from the cache while the session's version is unchanged."""
+    version = st.session_state.get("session_versions", {}).get(str(sid))
+    cached = cache_get(("session", str(sid)), version) if version is not None else None
+    if cached is not None:
+        return cached
+    # Version unknown or changed: revalidate, the backend answers 304 if our copy is still current
+    entry = st.session_state.setdefault("api_cache", {}).get((get_token(), ("session", str(sid))))
+    headers = {"If-None-Match": entry["etag"]} if entry and entry.get("etag") else {}
+    r = api_request("GET", f"/session/{sid}", headers=headers)
+    session = entry["data"] if r.status_code == 304 else r.json()
+    cache_put(("session", str(sid)), session.get("version"), session, etag=r.headers.get("ETag"))
+    return session
+
+def record_turn(sid, data):
+    """Apply a write response (the new messages, name and version) to the cached copy of the session,
+    so the next rerun finds it current instead of downloading the whole session again."""
+    key = (get_token(), ("session", str(sid)))
+    entry = st.session_state.setdefault("api_cache", {}).get(key)
+    if entry is not None and data.get("version") is not None:
+        session = dict(entry["data"], name=data.get("name") or entry["data"].get("name"), version=data["version"])
+        session["messages"] = entry["data"].get("messages", []) + data["messages"]
+        cache_put(("session", str(sid)), data["version"], session)
+    held = st.session_state.get("messages") if st.session_state.get("messages_sid") == sid else None
+    if held is not None:
+        st.session_state["messages"] = held + data["messages"]
+    else:
+        st.session_state.pop("messages", None)  # shown from the session on rerun
+
 def ensure_at_least_one_session():
     try:
         resp = api_request("POST", "/session/new")  # Authorized
@@ -387,11 +491,7 @@ if st.session_state.current_page == "chat":
                 st.sidebar.error(f"Could not create session: {e}")
 
     # load sessions list
-    try:
-        r = api_request("GET", "/session/list")
-        sessions = r.json() if r.status_code == 200 else []
-    except Exception:
-        sessions = []
+    sessions = load_sessions()
 
     # If no sessions at all, create one automatically (first-time user)
     if not sessions:
@@ -402,8 +502,7 @@ if st.session_state.current_page == "chat":
             st.session_state.current_session = sid
 
             # reload sessions
-            r2 = api_request("GET", "/session/list")
-            sessions = r2.json() if r2.status_code == 200 else []
+            sessions = load_sessions()
         except Exception:
             pass
 
@@ -467,7 +566,7 @@ if st.session_state.current_page == "chat":
             # ✅ Open button (full width + truncated text)
             if col_open.button(name, key=open_key, type="secondary", use_container_width=True):
                 st.session_state.current_session = session_id_val
-                st.session_state.messages = s.get("messages", [])
+                st.session_state.pop("messages", None)  # lean list has no messages; reload from /session/{sid}
                 st.session_state.pop("last_uploaded", None)
                 st.rerun()
 
@@ -479,6 +578,10 @@ if st.session_state.current_page == "chat":
                     pass
                 st.rerun()
 
+        if st.session_state.get("sessions_more") and st.sidebar.button("Load more", key="more_sessions_btn", use_container_width=True):
+            st.session_state["session_pages"] = st.session_state.get("session_pages", 1) + 1
+            st.rerun()
+
 
     st.sidebar.markdown("""
     <hr>
@@ -502,12 +605,11 @@ if st.session_state.current_page == "chat":
                 st.session_state.current_session = sid
 
         # ✅ fetch selected session
-        r = api_request("GET", f"/session/{sid}")
-        if r.status_code != 200:
+        try:
+            session = fetch_session(sid)
+        except Exception:
             st.error("Session not found.")
             st.stop()
-
-        session = r.json()
     else:
         st.info("Please log in to start.")
         st.stop()
@@ -523,7 +625,8 @@ if st.session_state.current_page == "chat":
 
     # ---------- Messages display area ----------
     st.markdown('<div class="message-box">', unsafe_allow_html=True)
-    messages = st.session_state.get("messages", session.get("messages", []))
+    held = st.session_state.get("messages") if st.session_state.get("messages_sid") == sid else None
+    messages = held if held is not None else session.get("messages", [])
     st.markdown('</div>', unsafe_allow_html=True)
 
     for m in messages:
@@ -649,29 +752,72 @@ if st.session_state.current_page == "chat":
     # --- Top layout with voice + chat input
 
     #################
-    # --- Helper function to send message ---
+    # --- Helper functions to send a message and stream the reply ---
+    def stream_reply(user_text):
+        """Yields the assistant reply as it arrives over SSE, then records the persisted messages."""
+        resp = api_request("POST", f"/session/{sid}/message/stream", data={"text": user_text}, stream=True)
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "delta":
+                    yield data["text"]
+                elif event == "error":
+                    raise RuntimeError(data["detail"])
+                elif event == "done":
+                    record_turn(sid, data)
+
     def send_message(user_text):
         st.session_state["processing"] = True
         try:
-            resp = api_request("POST", f"/session/{sid}/message", data={"text": user_text})
-            resp.raise_for_status()
-            data = resp.json()
-            st.session_state["messages"] = data["session"]["messages"]
+            with st.chat_message("user"):
+                st.markdown(user_text)
+            with st.chat_message("assistant"):
+                st.write_stream(stream_reply(user_text))
         except Exception as e:
             st.error(f"Error sending message: {e}")
         finally:
             st.session_state["processing"] = False
             st.rerun()  # refresh chat after sending
 
+    def refresh_messages():
+        """Append only messages newer than the last one held locally (full fetch if none are held)."""
+        held = st.session_state.get("messages") if st.session_state.get("messages_sid") == sid else None
+        if held:
+            try:
+                r = api_request("GET", f"/session/{sid}", params={"after_id": held[-1]["id"]})
+                st.session_state["messages"] = held + r.json().get("messages", [])
+                return
+            except Exception:
+                pass  # anchor message gone -> fall back to a full reload
+        r = api_request("GET", f"/session/{sid}")
+        st.session_state["messages"] = r.json().get("messages", [])
+        st.session_state["messages_sid"] = sid
+
+    def wait_for_document(doc_id: str, filename: str) -> dict:
+        """Poll the ingestion status of an accepted upload until it is ready or failed (or we stop waiting)."""
+        bar = st.progress(0.0, text=f"Processing {filename}...")
+        deadline = time.monotonic() + DOCUMENT_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            status = api_request("GET", f"/session/{sid}/documents/{doc_id}/status").json()
+            bar.progress(min(max(status.get("progress") or 0.0, 0.0), 1.0), text=f"Processing {filename}...")
+            if status.get("status") in ("ready", "failed"):
+                bar.empty()
+                return status
+            time.sleep(1)
+        bar.empty()
+        return {"status": "failed", "error": f"{filename} is still being processed after {DOCUMENT_WAIT_SECONDS / 60:.0f} minutes. "
+                                              "It will appear in this session if processing completes; otherwise upload it again."}
+
     def add_message_to_session(role: str, content: str, msg_type: str = "info"):
         """Append a message (bot or user) directly to backend session."""
         try:
             payload = {"role": role, "content": content, "type": msg_type}
             # requests.post(f"{BACKEND}/session/{sid}/add_message", json=payload)
             # Refresh the local message list
-            r = api_request("GET", f"/session/{sid}")
-            if r.status_code == 200:
-                st.session_state["messages"] = r.json().get("messages", [])
+            refresh_messages()
         except Exception as e:
             st.error(f"Failed to add message: {e}")
 
@@ -764,14 +910,18 @@ if st.session_state.current_page == "chat":
                         files = {"file": (uploaded_file.name, file_bytes)}
                         resp = api_request("POST", f"/session/{sid}/upload", files=files)
 
-                        if resp.status_code == 200:
-                            # Refresh messages
-                            r_refresh = api_request("GET", f"/session/{sid}")
-                            if r_refresh.status_code == 200:
-                                st.session_state["messages"] = r_refresh.json().get("messages", [])
-
-                            # Mark as uploaded
+                        if resp.status_code in (201, 202):
+                            # Mark as uploaded so a rerun does not resubmit it
                             st.session_state["last_uploaded"] = file_hash
+                            status = resp.json()
+                            if status.get("status") != "ready":
+                                status = wait_for_document(status["document_id"], uploaded_file.name)
+                            if status.get("status") == "failed":
+                                st.error(status.get("error") or "Upload failed")
+                                continue
+
+                            # Refresh messages
+                            refresh_messages()
                             st.success(f"Uploaded {uploaded_file.name}")
                             st.rerun()
                         else:
@@ -785,17 +935,7 @@ if st.session_state.current_page == "chat":
             # user_input = st.session_state.get("main_chat_input", None)
             user_text = user_input["text"].strip()
             if user_text != "":
-                st.session_state["processing"] = True
-                try:
-                    resp = api_request("POST", f"/session/{sid}/message", data={"text": user_text})
-                    resp.raise_for_status()
-                    data = resp.json()
-                    st.session_state["messages"] = data["session"]["messages"]
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                finally:
-                    st.session_state["processing"] = False
-                    st.rerun()
+                send_message(user_text)
 
     # Action buttons
     actions = ["summarize", "flashcards", "resources", "quiz", "report", "grammar"]
@@ -1244,7 +1384,7 @@ if st.session_state.current_page == "chat":
             resp =  api_request("POST", f"/session/{sid}/generate/{which_action}", data={"text": add_text, "lang": lang_pref})
             resp.raise_for_status()
             data = resp.json()
-            st.session_state["messages"] = data["session"]["messages"]
+            record_turn(sid, data)
         except Exception as e:
             st.error(f"Action error: {e}")
         finally:
@@ -0,0 +1,161 @@
+"""Shared fixtures.
+
+Pure-logic tests run anywhere. Tests using the `db` / `client` fixtures need a throwaway Postgres
+database in TEST_DATABASE_URL (it is migrated down to nothing and back up at the start of the run):
+
+    pip install -r requirements-dev.txt
+    TEST_DATABASE_URL=postgresql+psycopg://postgres@localhost:5432/edumentor_test python -m pytest
+
+Without it those tests are skipped.
+"""
+import asyncio
+import os
+
+# Settings are read once, at first import of the backend
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("JWT_SECRET", "test")
+if os.getenv("TEST_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event, text
+
+from backend import migrations
+from backend.database import SessionLocal, engine
+from backend.deps import CurrentUser
+from backend.models import Message, Session as DBSession, User
+
+
+@pytest.fixture(scope="session")
+def migrated():
+    if not os.getenv("TEST_DATABASE_URL"):
+        pytest.skip("TEST_DATABASE_URL is not set")
+    migrations.downgrade(engine, 0)
+    migrations.upgrade(engine)
+    return engine
+
+
+@pytest.fixture
+def db(migrated):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with migrated.begin() as conn:
+            conn.execute(text("TRUNCATE users, document_blobs CASCADE"))
+
+
+@pytest.fixture
+def user(db) -> CurrentUser:
+    u = User(id=uuid4(), email=f"{uuid4().hex}@example.com", name="Test", hashed_password="x", provider="local")
+    db.add(u)
+    db.commit()
+    return CurrentUser.from_user(u)
+
+
+@pytest.fixture
+def make_session(db, user):
+    """Creates a session of `user` holding `n_messages` alternating user/assistant messages."""
+    def make(n_messages: int = 0, name: str = "Untitled Session") -> DBSession:
+        s = DBSession(id=uuid4(), user_id=user.id, name=name)
+        db.add(s)
+        start = datetime.utcnow() - timedelta(hours=1)
+        db.add_all(
+            Message(id=uuid4(), session_id=s.id, role="user" if i % 2 == 0 else "assistant", type="chat",
+                    content=f"message {i}", created_at=start + timedelta(seconds=i))
+            for i in range(n_messages)
+        )
+        db.commit()
+        return s
+    return make
+
+
+@pytest.fixture
+def client(migrated, user):
+    from fastapi.testclient import TestClient
+    from backend.deps import get_current_user
+    from backend.main import app
+
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield TestClient(app)  # not entered: the lifespan (startup probe, ingest resume) does not run
+    finally:
+        app.dependency_overrides.clear()
+
+
+class FakeModel:
+    """Stands in for the OpenAI calls made by the sessions router."""
+
+    def __init__(self, reply="fake reply", title="Fake Title", reply_delay=0.0, title_delay=0.0, fail=False):
+        self.reply, self.title = reply, title
+        self.reply_delay, self.title_delay, self.fail = reply_delay, title_delay, fail
+        self.chat_calls = self.title_calls = 0
+        self.title_cancelled = False
+        self.in_flight = self.max_in_flight = 0
+
+    async def chat(self, messages):
+        self.chat_calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.reply_delay)
+            if self.fail:
+                raise RuntimeError("model down")
+            return self.reply
+        finally:
+            self.in_flight -= 1
+
+    async def chat_stream(self, messages):
+        await asyncio.sleep(self.reply_delay)
+        if self.fail:
+            raise RuntimeError("model down")
+        half = len(self.reply) // 2
+        yield self.reply[:half]
+        yield self.reply[half:]
+
+    async def generate_title(self, prompt):
+        self.title_calls += 1
+        try:
+            await asyncio.sleep(self.title_delay)
+        except asyncio.CancelledError:
+            self.title_cancelled = True
+            raise
+        return self.title
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Installs a FakeModel configured by the test: `fake = model(reply_delay=0.3)`."""
+    from backend.routers import sessions as sessions_router
+
+    def install(**kwargs) -> FakeModel:
+        fake = FakeModel(**kwargs)
+        for name in ("chat", "chat_stream", "generate_title"):
+            monkeypatch.setattr(sessions_router, name, getattr(fake, name))
+        return fake
+    return install
+
+
+@pytest.fixture
+def fake_model(model) -> FakeModel:
+    return model()
+
+
+@contextmanager
+def count_statements():
+    """Collects (statement, parameters) of the SQL executed on the app's engine inside the block."""
+    statements: list[tuple[str, object]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import security
+from backend.main import app
+from backend.models import User
+
+
+@pytest.fixture
+def hasher_limits(monkeypatch):
+    monkeypatch.setattr(security.settings, "PASSWORD_HASH_WORKERS", 2)
+    monkeypatch.setattr(security.settings, "PASSWORD_HASH_QUEUE_LIMIT", 1)
+    return 3
+
+
+def test_hasher_refuses_work_beyond_workers_and_queue(hasher_limits):
+    release = threading.Event()
+
+    async def run():
+        admitted = [asyncio.create_task(security._run_hasher(release.wait, 5)) for _ in range(hasher_limits)]
+        await asyncio.sleep(0)   # all admitted: two running, one queued
+        with pytest.raises(security.PasswordHasherBusy):
+            await security._run_hasher(lambda: None)
+        release.set()
+        await asyncio.gather(*admitted)
+        return await security._run_hasher(lambda: "admitted again")
+
+    assert asyncio.run(run()) == "admitted again"
+    assert security._admitted == 0
+
+
+@pytest.fixture
+def auth_client(migrated, db, monkeypatch):
+    # Cheap hashes: the behaviour under test does not depend on the cost
+    monkeypatch.setattr(security, "pwd_context", security._password_context(5))
+    return TestClient(app)
+
+
+@pytest.fixture
+def account(db):
+    def make(password: str, rounds: int = 5) -> User:
+        u = User(id=uuid4(), email=f"{uuid4().hex}@example.com", name="Test", provider="local",
+                 hashed_password=security._password_context(rounds).hash(password))
+        db.add(u)
+        db.commit()
+        return u
+    return make
+
+
+def _login(client, email, password):
+    return client.post("/auth/login", data={"username": email, "password": password})
+
+
+def test_busy_hasher_answers_503(auth_client, account, hasher_limits, monkeypatch):
+    u = account("secret")
+    monkeypatch.setattr(security, "_admitted", hasher_limits)
+    for r in (_login(auth_client, u.email, "secret"),
+              _login(auth_client, "nobody@example.com", "secret"),
+              auth_client.post("/auth/register", json={"email": "new@example.com", "name": "New", "password": "secret"})):
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == "1"
+
+
+def test_login_rehashes_when_the_cost_changes(auth_client, account, db):
+    u = account("secret", rounds=4)
+    assert _login(auth_client, u.email, "secret").status_code == 200
+    db.expire_all()
+    rehashed = db.get(User, u.id).hashed_password
+    assert rehashed.startswith("$2b$05$")
+    assert _login(auth_client, u.email, "secret").status_code == 200
+    db.expire_all()
+    assert db.get(User, u.id).hashed_password == rehashed   # current cost: left alone
+
+
+def test_wrong_password_keeps_the_hash(auth_client, account, db):
+    u = account("secret", rounds=4)
+    assert _login(auth_client, u.email, "wrong").status_code == 401
+    db.expire_all()
+    assert db.get(User, u.id).hashed_password == u.hashed_password
+
+
+def test_unknown_email_costs_a_password_check(auth_client, monkeypatch):
+    checks = []
+    monkeypatch.setattr(security.pwd_context, "dummy_verify", lambda: checks.append(True))
+    r = _login(auth_client, "nobody@example.com", "secret")
+    assert r.status_code == 401
+    assert r.json()["detail"] == "Incorrect email or password"
+    assert checks == [True]
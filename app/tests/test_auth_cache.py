@@ -0,0 +1,38 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from backend import deps
+from backend.deps import CurrentUser
+
+
+def _user() -> CurrentUser:
+    return CurrentUser(id=uuid4(), email=f"{uuid4().hex}@example.com", name="U", provider="local", created_at=datetime.utcnow())
+
+
+@pytest.fixture(autouse=True)
+def user_cache():
+    """The cache is process-wide: each test starts from, and leaves behind, an empty one."""
+    deps._user_cache.clear()
+    yield deps._user_cache
+    deps._user_cache.clear()
+
+
+def test_invalidate_user_drops_all_of_their_tokens_only(user_cache):
+    alice, bob = _user(), _user()
+    for token, user in (("a1", alice), ("a2", alice), ("b1", bob)):
+        user_cache.set(token, user)
+    deps.invalidate_user(alice.id)
+    assert user_cache.get("a1") is None and user_cache.get("a2") is None
+    assert user_cache.get("b1") == bob
+
+
+def test_nothing_is_kept_per_user_outside_the_bounded_cache(user_cache):
+    assert not hasattr(deps, "_tokens_by_user")
+    user = _user()
+    for i in range(user_cache.max_entries + 10):
+        user_cache.set(f"token-{i}", user)
+    assert user_cache.stats()["size"] == user_cache.max_entries
+    deps.invalidate_user(user.id)
+    assert user_cache.stats()["size"] == 0
@@ -0,0 +1,51 @@
+from backend.utils import cache as cache_module
+from backend.utils.cache import TTLCache, response_cache_key
+
+
+def test_get_set_and_stats():
+    c = TTLCache(max_entries=10, ttl_seconds=60)
+    assert c.get("k") is None
+    c.set("k", "v")
+    assert c.get("k") == "v"
+    assert c.stats() | {"max_entries": 10} == {"size": 1, "max_entries": 10, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    c = TTLCache(max_entries=10, ttl_seconds=60)
+    c.set("a", 1)
+    c.set("b", 2, ttl_seconds=5)
+    now[0] += 10
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    now[0] += 60
+    assert c.get("a") is None
+    assert c.stats()["size"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    c = TTLCache(max_entries=2, ttl_seconds=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert (c.get("a"), c.get("c")) == (1, 3)
+    assert c.stats()["evictions"] == 1
+
+
+def test_delete_where():
+    c = TTLCache(max_entries=10, ttl_seconds=60)
+    for i in range(6):
+        c.set(i, i % 3)
+    assert c.delete_where(lambda v: v == 0) == 2
+    assert c.get(0) is None and c.get(3) is None
+    assert c.get(1) == 1
+
+
+def test_response_cache_key_normalizes_the_prompt():
+    key = response_cache_key("summarize", "  Chapter   ONE ", "digest", "en", "model")
+    assert key == response_cache_key("summarize", "chapter one", "digest", "en", "model")
+    assert key != response_cache_key("summarize", "chapter one", "other", "en", "model")
+    assert key != response_cache_key("flashcards", "chapter one", "digest", "en", "model")
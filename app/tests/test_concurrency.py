@@ -0,0 +1,93 @@
+"""Load test: many chat requests in flight at once against a fake OpenAI server.
+
+The real AsyncOpenAI client talks to a local fake of POST /v1/chat/completions that answers after a
+fixed delay, and the app is driven over ASGI in the same event loop. While the model calls are
+pending, the worker must hold all of them at once and keep answering other requests.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import Body, FastAPI
+from openai import AsyncOpenAI
+
+from backend.deps import get_current_user
+from backend.main import app
+from backend.utils import openai_client
+
+CONCURRENT_REQUESTS = 60   # above the connection pool (10 + 20 overflow) and the threadpool (40)
+MODEL_DELAY = 1.0
+
+
+class FakeOpenAI:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = self.max_in_flight = self.calls = 0
+        self.app = FastAPI()
+        self.app.post("/v1/chat/completions")(self.completions)
+
+    async def completions(self, body: dict = Body(...)):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return {
+            "id": f"chatcmpl-{self.calls}", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "fake reply"}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+
+@pytest.fixture
+def fake_openai(monkeypatch) -> FakeOpenAI:
+    server = FakeOpenAI(MODEL_DELAY)
+    client = AsyncOpenAI(api_key="test", base_url="http://fake-openai/v1",
+                         http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app)))
+    monkeypatch.setattr(openai_client, "async_client", client)
+    return server
+
+
+@pytest.fixture
+def api(migrated, user):
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_worker_holds_many_model_calls_and_keeps_serving(api, make_session, fake_openai):
+    sessions = [make_session(4, name="Named") for _ in range(CONCURRENT_REQUESTS + 1)]
+
+    async def run():
+        async with api:
+            # One-off costs (tokenizer load, first connections) are not what is measured
+            assert (await api.post(f"/session/{sessions[-1].id}/message", data={"text": "warm up"})).status_code == 200
+            fake_openai.max_in_flight = 0
+            start = time.monotonic()
+            sends = [asyncio.create_task(api.post(f"/session/{s.id}/message", data={"text": f"question {i}"}))
+                     for i, s in enumerate(sessions[:-1])]
+            # All calls are pending at once only if none has to wait for another to finish
+            while fake_openai.in_flight < CONCURRENT_REQUESTS:
+                assert time.monotonic() - start < 5 * MODEL_DELAY, f"only {fake_openai.in_flight} calls in flight"
+                await asyncio.sleep(0.01)
+            # Every model call is pending: other requests are still answered at once
+            ping_start = time.monotonic()
+            ping = await api.get("/")
+            ping_seconds = time.monotonic() - ping_start
+            listed = await api.get("/session/list", params={"lean": "true"})
+            assert fake_openai.in_flight == CONCURRENT_REQUESTS
+            responses = await asyncio.gather(*sends)
+            return ping, ping_seconds, listed, responses, time.monotonic() - start
+
+    ping, ping_seconds, listed, responses, elapsed = asyncio.run(run())
+    assert ping.status_code == 200 and ping_seconds < MODEL_DELAY / 4
+    assert listed.status_code == 200
+    assert [r.status_code for r in responses] == [200] * CONCURRENT_REQUESTS
+    assert all(r.json()["reply"] == "fake reply" for r in responses)
+    assert fake_openai.max_in_flight == CONCURRENT_REQUESTS
+    assert elapsed < 3 * MODEL_DELAY   # concurrent, not CONCURRENT_REQUESTS * MODEL_DELAY
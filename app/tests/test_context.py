@@ -0,0 +1,71 @@
+from backend.utils.context import MESSAGE_OVERHEAD, assemble_context
+from backend.utils.tokens import count_tokens
+
+SYSTEM = ["You are a tutor.", "Please respond in English."]
+
+
+def _history(n: int, words: int = 20) -> list[tuple[str, str]]:
+    return [("user" if i % 2 == 0 else "assistant", f"turn{i} " + "word " * words) for i in range(n)]
+
+
+def test_everything_fits():
+    ctx = assemble_context(SYSTEM, [("notes.pdf", "short notes")], _history(4), "question?", max_tokens=10000)
+    roles = [m["role"] for m in ctx.messages]
+    assert roles == ["system", "system", "user", "user", "assistant", "user", "assistant", "user"]
+    assert ctx.messages[2]["content"].startswith("Document 'notes.pdf' content")
+    assert ctx.messages[-1] == {"role": "user", "content": "question?"}
+    assert ctx.usage["history_omitted"] == 0
+
+
+def test_usage_stays_within_budget():
+    documents = [("a.pdf", "alpha " * 5000), ("b.pdf", "beta " * 5000)]
+    ctx = assemble_context(SYSTEM, documents, _history(200), "summarize", max_tokens=6000)
+    usage = ctx.usage
+    assert usage["budget"] == 6000 - 2000  # CONTEXT_COMPLETION_RESERVE
+    assert usage["total"] <= usage["budget"]
+    assert usage["total"] == usage["system"] + usage["documents"] + usage["history"] + usage["prompt"]
+    sent = sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in ctx.messages)
+    assert sent <= usage["budget"]
+
+
+def test_oldest_history_is_dropped_with_a_note():
+    history = _history(200)
+    ctx = assemble_context(SYSTEM, [], history, "next", max_tokens=4000)
+    omitted = ctx.usage["history_omitted"]
+    assert 0 < omitted < len(history)
+    kept = [m for m in ctx.messages if m["role"] in ("user", "assistant")][:-1]
+    assert [m["content"] for m in kept] == [c for _, c in history[omitted:]]   # most recent, in order
+    assert any(m["role"] == "system" and f"{omitted} earlier messages" in m["content"] for m in ctx.messages)
+
+
+def test_documents_share_the_budget_evenly():
+    documents = [("a.pdf", "alpha " * 5000), ("b.pdf", "beta " * 5000), ("c.txt", "tiny")]
+    ctx = assemble_context(SYSTEM, documents, [], "q", max_tokens=5000)
+    parts = [m["content"] for m in ctx.messages if m["content"].startswith("Document ")]
+    assert len(parts) == 3
+    a, b = count_tokens(parts[0]), count_tokens(parts[1])
+    assert abs(a - b) <= 2        # the short document's unused share is split between the long ones
+    assert parts[2].endswith("tiny")
+
+
+def test_inline_documents_are_appended_to_the_prompt():
+    ctx = assemble_context(SYSTEM, [("a.pdf", "some text")], [], "Summarize", inline_documents=True, max_tokens=5000)
+    assert len(ctx.messages) == 3
+    assert ctx.messages[-1]["content"].startswith("Summarize\n\nDocuments content:\nDocument 'a.pdf'")
+
+
+def test_documents_digest_follows_included_excerpts():
+    one = assemble_context(SYSTEM, [("a.pdf", "some text")], [], "q", max_tokens=5000)
+    same = assemble_context(SYSTEM, [("a.pdf", "some text")], _history(3), "other", max_tokens=5000)
+    other = assemble_context(SYSTEM, [("a.pdf", "other text")], [], "q", max_tokens=5000)
+    assert one.documents_digest == same.documents_digest
+    assert one.documents_digest != other.documents_digest
+
+
+def test_documents_digest_ignores_file_names():
+    one = assemble_context(SYSTEM, [("a.pdf, part 1", "some text"), ("b.pdf, part 3", "more")], [], "q", max_tokens=5000)
+    renamed = assemble_context(SYSTEM, [("notes.pdf, part 1", "some text"), ("c.pdf, part 3", "more")], [], "q",
+                               max_tokens=5000)
+    assert one.documents_digest == renamed.documents_digest
+    dropped = assemble_context(SYSTEM, [("a.pdf, part 1", "some text")], [], "q", max_tokens=5000)
+    assert one.documents_digest != dropped.documents_digest
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+from backend.database import SessionLocal, engine_options
+from backend.settings import Settings
+
+
+def settings(**overrides) -> Settings:
+    return Settings(OPENAI_API_KEY="test", JWT_SECRET="test", **overrides)
+
+
+def test_pool_settings_reach_the_engine():
+    options = engine_options(settings(DB_POOL_SIZE=3, DB_MAX_OVERFLOW=4, DB_POOL_TIMEOUT=2.5,
+                                      DB_POOL_RECYCLE=600, DB_POOL_PRE_PING=False))
+    assert options == {"pool_size": 3, "max_overflow": 4, "pool_timeout": 2.5, "pool_recycle": 600, "pool_pre_ping": False}
+    pool = create_engine("postgresql+psycopg://u:p@db/x", **options).pool
+    assert isinstance(pool, QueuePool)
+    assert (pool.size(), pool._max_overflow, pool.timeout(), pool._recycle, pool._pre_ping) == (3, 4, 2.5, 600, False)
+
+
+def test_pgbouncer_mode_keeps_no_pool_and_prepares_nothing():
+    options = engine_options(settings(DB_PGBOUNCER=True, DB_POOL_SIZE=3))
+    assert options == {"poolclass": NullPool, "connect_args": {"prepare_threshold": None}}
+    assert isinstance(create_engine("postgresql+psycopg://u:p@db/x", **options).pool, NullPool)
+
+
+@pytest.fixture
+def tiny_pool(migrated):
+    """The app's sessions draw from a one-connection pool that gives up after 0.2s."""
+    small = create_engine(migrated.url, pool_size=1, max_overflow=0, pool_timeout=0.2)
+    SessionLocal.configure(bind=small)
+    try:
+        yield small
+    finally:
+        SessionLocal.configure(bind=migrated)
+        small.dispose()
+
+
+def test_exhausted_pool_answers_503(client, tiny_pool):
+    held = tiny_pool.connect()
+    try:
+        r = client.get("/session/list")
+    finally:
+        held.close()
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+    assert r.json()["detail"] == "Server busy, please retry"
+    assert client.get("/session/list").status_code == 200
+
+
+def test_request_waits_for_a_connection_freed_in_time(client, tiny_pool):
+    held = tiny_pool.connect()
+    threading.Timer(0.05, held.close).start()
+    assert client.get("/session/list").status_code == 200
@@ -0,0 +1,107 @@
+import hashlib
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from backend.models import Document, DocumentBlob, Session as DBSession, User
+from backend.utils.retrieval import add_document_chunks
+
+TEXT = "Photosynthesis — التمثيل الضوئي — turns light into chemical energy."
+
+
+@pytest.fixture
+def blob_document(db, make_session):
+    s = make_session()
+    blob = DocumentBlob(sha256="a" * 64, content=TEXT, char_count=len(TEXT), page_count=2,
+                        page_offsets=[0, 17], created_at=datetime.utcnow())
+    d = Document(id=uuid4(), session_id=s.id, filename="bio.pdf", content="", blob_sha256=blob.sha256,
+                 char_count=len(TEXT), page_count=2, status="ready")
+    db.add_all([blob, d])
+    db.commit()
+    return s, d
+
+
+@pytest.fixture
+def legacy_document(db, make_session):
+    s = make_session()
+    d = Document(id=uuid4(), session_id=s.id, filename="old.txt", content=TEXT, status="ready")
+    db.add(d)
+    db.commit()
+    return s, d
+
+
+def _content(client, s, d, **params):
+    return client.get(f"/session/{s.id}/documents/{d.id}/content", params=params)
+
+
+@pytest.mark.parametrize("which", ["blob_document", "legacy_document"])
+@pytest.mark.parametrize("params, expected", [
+    ({}, TEXT),
+    ({"offset": 17}, TEXT[17:]),
+    ({"offset": 17, "length": 14}, "التمثيل الضوئي"),   # characters, not bytes
+    ({"length": 5}, TEXT[:5]),
+    ({"offset": 60, "length": 1000}, TEXT[60:]),
+    ({"offset": 1000}, ""),
+])
+def test_content_is_sliced_by_offset_and_length(client, request, which, params, expected):
+    s, d = request.getfixturevalue(which)
+    body = _content(client, s, d, **params).json()
+    assert body["content"] == expected
+    assert body["offset"] == params.get("offset", 0)
+    assert body["char_count"] == len(TEXT)
+    assert body["filename"] == d.filename
+
+
+@pytest.mark.parametrize("params", [{"offset": -1}, {"length": 0}])
+def test_invalid_ranges_are_rejected(client, blob_document, params):
+    s, d = blob_document
+    assert _content(client, s, d, **params).status_code == 422
+
+
+def test_other_users_documents_are_not_found(client, db, blob_document):
+    s, d = blob_document
+    other = User(id=uuid4(), email=f"{uuid4().hex}@example.com", name="Other", hashed_password="x", provider="local")
+    other_session = DBSession(id=uuid4(), user_id=other.id, name="Theirs")
+    theirs = Document(id=uuid4(), session_id=other_session.id, filename="secret.txt", content="secret", status="ready")
+    db.add(other)
+    db.flush()
+    db.add_all([other_session, theirs])
+    db.commit()
+
+    assert _content(client, other_session, theirs).status_code == 404
+    assert _content(client, s, theirs).status_code == 404          # own session, their document
+    assert _content(client, other_session, d).status_code == 404   # their session, own document
+    assert client.get(f"/session/{other_session.id}/documents/{theirs.id}/status").status_code == 404
+
+
+def test_document_in_another_session_of_the_same_user_is_not_found(client, make_session, blob_document):
+    s, d = blob_document
+    assert _content(client, make_session(), d).status_code == 404
+
+
+def test_session_payload_lists_documents_without_their_text(client, blob_document):
+    s, d = blob_document
+    documents = client.get(f"/session/{s.id}").json()["documents"]
+    assert [(doc["id"], doc["filename"], doc["char_count"], doc["page_count"]) for doc in documents] == \
+        [(str(d.id), "bio.pdf", len(TEXT), 2)]
+    assert "content" not in documents[0]
+
+
+def test_same_material_under_another_name_reuses_the_cached_reply(client, db, make_session, model):
+    fake = model(reply="A summary.")
+    text = f"Material {uuid4().hex}: photosynthesis turns light into chemical energy. " * 20
+    blob = DocumentBlob(sha256=hashlib.sha256(text.encode()).hexdigest(), content=text, char_count=len(text),
+                        page_count=1, page_offsets=[0], created_at=datetime.utcnow())
+    db.add(blob)
+    db.flush()
+    add_document_chunks(db, text, blob_sha256=blob.sha256)
+    sessions = [make_session(name="Named") for _ in range(2)]
+    db.add_all(Document(id=uuid4(), session_id=s.id, filename=name, content="", blob_sha256=blob.sha256,
+                        char_count=len(text), status="ready")
+               for s, name in zip(sessions, ("bio.pdf", "copy of bio (2).pdf")))
+    db.commit()
+
+    replies = [client.post(f"/session/{s.id}/generate/summarize").json()["reply"] for s in sessions]
+    assert replies == ["A summary.", "A summary."]
+    assert fake.chat_calls == 1
@@ -0,0 +1,105 @@
+import io
+import threading
+from concurrent.futures import CancelledError, Executor, Future, ThreadPoolExecutor
+
+import pytest
+
+from backend.utils.file_extract import (
+    extract_pdf_pages, extract_pdf_parallel, is_supported, page_at, page_ranges, pdf_page_count,
+)
+
+
+def make_pdf(path, n_pages: int) -> str:
+    fpdf = pytest.importorskip("fpdf")
+    pdf = fpdf.FPDF()
+    pdf.set_font("Arial", size=12)
+    for i in range(n_pages):
+        pdf.add_page()
+        pdf.cell(0, 10, txt=f"page {i + 1}")
+    pdf.output(str(path))
+    return str(path)
+
+
+def test_page_ranges_cover_every_page_once():
+    assert page_ranges(0, 10) == []
+    assert page_ranges(5, 10) == [(0, 5)]
+    assert page_ranges(25, 10) == [(0, 10), (10, 20), (20, 25)]
+
+
+def test_page_lookup():
+    offsets = [0, 11, 12]   # "first page", "", "third"
+    assert page_at(offsets, 0) == 1
+    assert page_at(offsets, 10) == 1
+    assert page_at(offsets, 12) == 3
+    assert page_at(offsets, 16) == 3
+    assert page_at([], 5) == 1
+
+
+def test_parallel_extraction_writes_pages_in_order_with_offsets(tmp_path):
+    path = make_pdf(tmp_path / "doc.pdf", 23)
+    out, progress = io.StringIO(), []
+    with ThreadPoolExecutor(4) as pool:
+        page_count, offsets = extract_pdf_parallel(pool, path, out, pages_per_task=5, window=3,
+                                                   on_range=lambda end, total: progress.append((end, total)))
+    text = out.getvalue()
+    assert page_count == 23
+    assert progress == [(5, 23), (10, 23), (15, 23), (20, 23), (23, 23)]
+    assert [text[o:o + len(f"page {i + 1}")] for i, o in enumerate(offsets)] == [f"page {i + 1}" for i in range(23)]
+    assert text == "\n".join(extract_pdf_pages(path, 0, 23))
+    assert page_at(offsets, text.index("page 17")) == 17
+
+
+def test_parallel_extraction_keeps_at_most_a_window_of_ranges_in_flight(tmp_path):
+    path = make_pdf(tmp_path / "doc.pdf", 40)
+    lock, submitted, collected, most = threading.Lock(), [0], [0], [0]
+
+    class CountingPool(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            with lock:
+                submitted[0] += 1
+                most[0] = max(most[0], submitted[0] - collected[0])
+            return super().submit(fn, *args)
+
+    def wait(future):
+        result = future.result()
+        collected[0] += 1
+        return result
+
+    with CountingPool(4) as pool:
+        extract_pdf_parallel(pool, path, io.StringIO(), pages_per_task=2, window=3, wait=wait)
+    assert submitted[0] == 21   # page count + 20 ranges
+    assert most[0] == 3
+
+
+def test_interrupted_extraction_cancels_queued_ranges(tmp_path):
+    path = make_pdf(tmp_path / "doc.pdf", 10)
+
+    class HeldPool(Executor):
+        """Runs nothing but the page count, so every range stays queued."""
+        def __init__(self):
+            self.futures = []
+
+        def submit(self, fn, *args):
+            future = Future()
+            if fn is pdf_page_count:
+                future.set_result(fn(*args))
+            self.futures.append(future)
+            return future
+
+    def wait(future):
+        if not future.done():
+            raise CancelledError()   # what shutdown(cancel_futures=True) does to the awaited range
+        return future.result()
+
+    pool = HeldPool()
+    with pytest.raises(CancelledError):
+        extract_pdf_parallel(pool, path, io.StringIO(), pages_per_task=1, window=4, wait=wait)
+    assert len(pool.futures) == 5   # page count + a window of ranges, nothing beyond it
+    assert all(f.cancelled() for f in pool.futures[2:])
+
+
+def test_is_supported():
+    assert is_supported("Notes.PDF")
+    assert is_supported("a.docx") and is_supported("b.txt")
+    assert not is_supported("image.png")
+    assert not is_supported(None)
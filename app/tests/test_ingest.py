@@ -0,0 +1,186 @@
+import os
+from concurrent.futures import CancelledError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from backend import ingest
+from backend.models import Document
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest, "submit", lambda document_id, path, filename, sha256: calls.append(document_id))
+    return calls
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    from backend.settings import get_settings
+    monkeypatch.setattr(get_settings(), "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def make_document(db, make_session, upload_dir):
+    s = make_session()
+
+    def make(status: str, heartbeat_age: float | None = None, with_file: bool = True, host: str | None = None) -> Document:
+        d = Document(id=uuid4(), session_id=s.id, filename="notes.txt", content="", status=status, progress=0.3,
+                     heartbeat_at=None if heartbeat_age is None else datetime.utcnow() - timedelta(seconds=heartbeat_age),
+                     upload_host=host or ingest.host())
+        db.add(d)
+        db.commit()
+        if with_file:
+            with open(ingest.upload_path(d.id, d.filename), "wb") as f:
+                f.write(b"some notes")
+        return d
+    return make
+
+
+def _status(db, d: Document) -> str:
+    db.expire_all()
+    return db.get(Document, d.id).status
+
+
+def test_pending_jobs_are_resubmitted(db, make_document, submitted):
+    d = make_document("pending")
+    ingest.resume_pending()
+    assert submitted == [d.id]
+    assert _status(db, d) == "pending"
+
+
+def test_job_held_by_a_live_worker_is_left_alone(db, make_document, submitted):
+    d = make_document("processing", heartbeat_age=5)
+    ingest.resume_pending()
+    assert submitted == []
+    assert _status(db, d) == "processing"
+
+
+def test_job_with_an_expired_lease_is_taken_over(db, make_document, submitted):
+    stale = make_document("processing", heartbeat_age=3600)
+    unleased = make_document("processing")   # claimed before leases existed
+    ingest.resume_pending()
+    assert sorted(submitted) == sorted([stale.id, unleased.id])
+    assert _status(db, stale) == "pending"
+
+
+def test_lease_expiring_after_startup_is_taken_over_later(db, make_document, submitted):
+    d = make_document("processing", heartbeat_age=5)   # worker crashed and came back within the lease
+    ingest.resume_pending()
+    assert submitted == []
+    db.query(Document).filter(Document.id == d.id).update({"heartbeat_at": datetime.utcnow() - timedelta(hours=1)})
+    db.commit()
+    ingest.reclaim_expired()
+    assert submitted == [d.id]
+    assert _status(db, d) == "pending"
+
+
+def test_periodic_check_leaves_pending_jobs_to_their_queue(db, make_document, submitted):
+    make_document("pending")
+    ingest.reclaim_expired()
+    assert submitted == []
+
+
+def test_job_without_its_upload_fails(db, make_document, submitted):
+    d = make_document("pending", with_file=False)
+    live = make_document("processing", heartbeat_age=5, with_file=False)
+    ingest.resume_pending()
+    assert submitted == []
+    assert _status(db, d) == "failed"
+    assert _status(db, live) == "processing"
+
+
+def test_a_job_is_claimed_once(db, make_document, monkeypatch):
+    d = make_document("pending")
+    assert ingest._update(d.id, Document.status == "pending", status="processing") == 1
+    assert ingest._update(d.id, Document.status == "pending", status="processing") == 0
+    ran = []
+    monkeypatch.setattr(ingest, "_pools", lambda: ran.append(True))
+    path = ingest.upload_path(d.id, d.filename)
+    ingest._run(d.id, path, d.filename, "0" * 64)   # not claimable: no-op
+    assert ran == []
+    assert os.path.exists(path)   # still owned by the worker that claimed it
+
+
+def test_another_hosts_jobs_are_left_alone(db, make_document, submitted):
+    d = make_document("pending", with_file=False, host="other-replica")
+    stale = make_document("processing", heartbeat_age=3600, with_file=False, host="other-replica")
+    ingest.resume_pending()
+    assert submitted == []
+    assert _status(db, d) == "pending"
+    assert _status(db, stale) == "processing"
+
+
+def test_unclaimable_job_of_a_deleted_document_removes_the_upload(db, make_document):
+    d = make_document("pending")
+    path = ingest.upload_path(d.id, d.filename)
+    db.delete(d)
+    db.commit()
+    ingest._run(d.id, path, d.filename, "0" * 64)
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("interruption", [CancelledError, BrokenProcessPool])
+def test_interrupted_job_is_left_to_be_resumed(db, make_document, monkeypatch, interruption):
+    d = make_document("pending")
+    path = ingest.upload_path(d.id, d.filename)
+
+    def interrupted(*args):
+        raise interruption()
+    monkeypatch.setattr(ingest, "_ingest", interrupted)
+    ingest._run(d.id, path, d.filename, "0" * 64)
+    assert _status(db, d) == "pending"
+    assert os.path.exists(path)
+
+
+def test_failed_job_records_an_error_and_removes_the_upload(db, make_document, monkeypatch):
+    d = make_document("pending")
+    path = ingest.upload_path(d.id, d.filename)
+
+    def broken(*args):
+        raise ValueError()
+    monkeypatch.setattr(ingest, "_ingest", broken)
+    ingest._run(d.id, path, d.filename, "0" * 64)
+    db.expire_all()
+    assert (db.get(Document, d.id).status, db.get(Document, d.id).error) == ("failed", "ValueError")
+    assert not os.path.exists(path)
+
+
+@pytest.fixture
+def extraction_pool(monkeypatch):
+    from backend.settings import get_settings
+    monkeypatch.setattr(get_settings(), "EXTRACT_PROCESSES", 2)
+    monkeypatch.setattr(get_settings(), "PDF_PAGES_PER_TASK", 3)
+    yield
+    with ingest._lock:
+        for pool in (ingest._extract_pool, ingest._coordinator):
+            if pool is not None:
+                pool.shutdown()
+        ingest._extract_pool = ingest._coordinator = None
+
+
+def test_pdf_is_extracted_in_page_ranges_with_offsets(db, make_session, upload_dir, extraction_pool):
+    from .test_file_extract import make_pdf
+    s = make_session()
+    d = Document(id=uuid4(), session_id=s.id, filename="book.pdf", content="", status="pending", progress=0.0,
+                 upload_host=ingest.host())
+    db.add(d)
+    db.commit()
+    path = make_pdf(ingest.upload_path(d.id, d.filename), 10)
+    with open(path, "rb") as f:
+        sha256 = ingest.sha256_file(f)
+
+    ingest._run(d.id, path, d.filename, sha256)
+    db.expire_all()
+    d = db.get(Document, d.id)
+    assert (d.status, d.page_count, d.error) == ("ready", 10, None)
+    blob = d.blob
+    assert len(blob.page_offsets) == 10
+    assert [blob.content[o:o + len(f"page {i + 1}")] for i, o in enumerate(blob.page_offsets)] == \
+        [f"page {i + 1}" for i in range(10)]
+    assert not os.path.exists(path)
+    assert os.listdir(upload_dir) == []   # the text spool is gone too
@@ -0,0 +1,53 @@
+from sqlalchemy import inspect
+
+from backend import migrations
+
+
+def test_revisions_are_consecutive_and_complete():
+    modules = migrations.load()
+    assert [m.revision for m in modules] == list(range(1, len(modules) + 1))
+    assert migrations.head() == len(modules)
+    for m in modules:
+        assert m.description
+        assert isinstance(m.transactional, bool)
+        assert callable(m.upgrade) and callable(m.downgrade)
+
+
+def test_upgrade_and_downgrade_round_trip(migrated):
+    with migrated.connect() as conn:
+        assert migrations.current(conn) == migrations.head()
+    assert migrations.downgrade(migrated, 0) == 0
+    with migrated.connect() as conn:
+        assert migrations.current(conn) == 0
+        assert "sessions" not in inspect(conn).get_table_names()
+    assert migrations.upgrade(migrated) == migrations.head()
+    assert migrations.upgrade(migrated) == migrations.head()   # nothing left to apply
+
+
+def test_migrations_build_the_models_schema(migrated):
+    """Every column and index the models declare exists after `upgrade` (a model change needs a migration)."""
+    from backend.models import Base
+
+    inspector = inspect(migrated)
+    for table in Base.metadata.sorted_tables:
+        columns = {c["name"]: c for c in inspector.get_columns(table.name)}
+        assert set(columns) == {c.name for c in table.columns}, table.name
+        for c in table.columns:
+            assert columns[c.name]["nullable"] == c.nullable, f"{table.name}.{c.name}"
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        assert {i.name for i in table.indexes} <= indexes, table.name
+
+
+def test_requests_are_refused_while_the_schema_is_behind(client, monkeypatch):
+    from backend import main
+
+    monkeypatch.setattr(main.db_ready, "is_set", lambda: True)
+    monkeypatch.setitem(main.schema, "current", main.schema["head"] - 1)
+    r = client.get("/session/list")
+    assert r.status_code == 503
+    assert "needs" in r.json()["detail"]
+    assert client.get("/readyz").json()["status"] == "schema_mismatch"
+    assert client.get("/").status_code == 200
+
+    monkeypatch.setitem(main.schema, "current", main.schema["head"])
+    assert client.get("/session/list").status_code == 200
@@ -0,0 +1,53 @@
+"""SQL statements per request on the hot session endpoints: a fixed number, however long the history."""
+import pytest
+
+from .conftest import count_statements
+
+pytestmark = pytest.mark.usefixtures("fake_model")
+
+
+def _statements(client, method, url, **kwargs) -> list[tuple[str, object]]:
+    with count_statements() as statements:
+        r = client.request(method, url, **kwargs)
+    assert r.status_code < 400, r.text
+    return statements
+
+
+@pytest.mark.parametrize("n_messages", [2, 60])
+def test_get_session(client, make_session, n_messages):
+    s = make_session(n_messages)
+    statements = _statements(client, "GET", f"/session/{s.id}")
+    assert len(statements) == 3, statements   # session row, messages, documents
+
+
+def test_get_session_not_modified_loads_nothing_else(client, make_session):
+    s = make_session(20)
+    etag = client.get(f"/session/{s.id}").headers["ETag"]
+    with count_statements() as statements:
+        r = client.get(f"/session/{s.id}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert len(statements) == 1, statements
+
+
+@pytest.mark.parametrize("n_messages", [2, 60])
+def test_send_message(client, make_session, n_messages):
+    s = make_session(n_messages, name="Named")
+    statements = _statements(client, "POST", f"/session/{s.id}/message", data={"text": "hello"})
+    # session + messages (selectin), retrieval index documents, version bump, message insert
+    assert len(statements) == 5, statements
+
+
+@pytest.mark.parametrize("n_messages", [2, 60])
+def test_generate_action(client, make_session, n_messages):
+    s = make_session(n_messages, name="Named")
+    statements = _statements(client, "POST", f"/session/{s.id}/generate/quiz", data={"text": "cells"})
+    # as /message, plus the "has documents" check
+    assert len(statements) == 6, statements
+
+
+@pytest.mark.parametrize("n_sessions", [3, 40])
+def test_lean_session_list(client, make_session, n_sessions):
+    for _ in range(n_sessions):
+        make_session(5)
+    statements = _statements(client, "GET", "/session/list", params={"lean": "true", "limit": 10})
+    assert len(statements) == 1, statements   # page with per-session aggregates (its rows give the ETag)
@@ -0,0 +1,51 @@
+"""The hot read paths use the composite indexes from migration 0004 (plans checked with EXPLAIN).
+
+The test tables are tiny, so sequential scans are disabled to see which indexes the planner can use."""
+from contextlib import contextmanager
+
+from backend.database import engine
+from .conftest import count_statements
+
+
+@contextmanager
+def captured_selects():
+    with count_statements() as statements:
+        yield statements
+    statements[:] = [(s, p) for s, p in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def plan(statement: str, parameters) -> str:
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        return "\n".join(row[0] for row in conn.exec_driver_sql("EXPLAIN " + statement, parameters))
+
+
+def plan_of(captured, fragment: str) -> str:
+    matches = [(s, p) for s, p in captured if fragment in s]
+    assert matches, f"no statement containing {fragment!r}"
+    return plan(*matches[0])
+
+
+def test_get_session(client, make_session):
+    s = make_session(30)
+    with captured_selects() as captured:
+        assert client.get(f"/session/{s.id}").status_code == 200
+    plans = [plan(*c) for c in captured]
+    assert all("Seq Scan" not in p for p in plans), plans
+    assert "ix_messages_session_id_created_at" in plan_of(captured, "FROM messages")
+    assert "ix_documents_session_id" in plan_of(captured, "FROM documents")
+
+
+def test_lean_session_list_limits_before_aggregating(client, make_session):
+    for _ in range(5):
+        make_session(3)
+    with captured_selects() as captured:
+        assert client.get("/session/list", params={"lean": "true", "limit": 2}).status_code == 200
+    page = plan_of(captured, "LATERAL")
+    assert "Seq Scan" not in page, page
+    assert "Index Scan Backward using ix_sessions_user_id_created_at_id" in page
+    assert "ix_messages_session_id_created_at" in page
+    # The page is cut (Limit) below the join, so only its sessions' messages are aggregated
+    lines = page.splitlines()
+    assert not lines[0].startswith("Limit"), page
+    assert next(i for i, l in enumerate(lines) if "Limit" in l) < next(i for i, l in enumerate(lines) if "Aggregate" in l)
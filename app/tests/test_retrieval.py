@@ -0,0 +1,60 @@
+from uuid import uuid4
+
+from backend.utils.retrieval import BM25Index, Chunk, split_into_chunks
+
+
+def test_chunks_respect_size_and_prefer_paragraphs():
+    paragraphs = [f"Paragraph {i}. " + "word " * 60 for i in range(10)]
+    text = "\n\n".join(p.strip() for p in paragraphs)
+    chunks = split_into_chunks(text, max_chars=500, overlap=0)
+    assert all(len(c) <= 500 for c in chunks)
+    assert all(c.startswith("Paragraph") for c in chunks)   # cut at paragraph boundaries
+    assert "".join(c.replace(" ", "").replace("\n", "") for c in chunks) == text.replace(" ", "").replace("\n", "")
+
+
+def test_chunks_overlap():
+    text = " ".join(f"w{i}" for i in range(400))
+    chunks = split_into_chunks(text, max_chars=200, overlap=50)
+    assert len(chunks) > 1
+    for a, b in zip(chunks, chunks[1:]):
+        assert a.split()[-1] in b.split()[:15]
+
+
+def test_chunks_of_empty_text():
+    assert split_into_chunks("") == []
+    assert split_into_chunks("   \n ") == []
+    assert split_into_chunks("short") == ["short"]
+
+
+def _index(docs: dict[str, list[str]]) -> BM25Index:
+    chunks = []
+    for name, parts in docs.items():
+        doc_id = uuid4()
+        chunks.extend(Chunk(doc_id, name, i, text) for i, text in enumerate(parts))
+    return BM25Index(chunks)
+
+
+def test_search_ranks_matching_chunks_and_keeps_reading_order():
+    index = _index({
+        "bio.pdf": ["cells divide by mitosis", "photosynthesis converts light", "mitosis has four phases mitosis"],
+        "hist.pdf": ["the roman empire", "the printing press"],
+    })
+    hits = index.search("What is mitosis?", k=2)
+    assert [(c.filename, c.ordinal) for c in hits] == [("bio.pdf", 0), ("bio.pdf", 2)]
+
+
+def test_search_without_matches_falls_back_to_spread():
+    index = _index({"a.pdf": ["alpha", "beta", "gamma"]})
+    assert [c.ordinal for c in index.search("zebra", k=2)] == [c.ordinal for c in index.spread(2)]
+
+
+def test_spread_covers_every_document_evenly():
+    index = _index({"a.pdf": [f"a{i}" for i in range(10)], "b.pdf": [f"b{i}" for i in range(10)]})
+    picked = index.spread(4)
+    assert [(c.filename, c.ordinal) for c in picked] == [("a.pdf", 0), ("a.pdf", 9), ("b.pdf", 0), ("b.pdf", 9)]
+    assert len(index.spread(100)) == 20
+
+
+def test_spread_with_more_documents_than_k():
+    index = _index({f"{i}.pdf": ["text"] for i in range(5)})
+    assert [c.filename for c in index.spread(3)] == ["0.pdf", "1.pdf", "2.pdf"]
@@ -0,0 +1,75 @@
+from datetime import timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from backend.models import Message
+
+pytestmark = pytest.mark.usefixtures("fake_model")
+
+
+def _messages(db, s) -> list[Message]:
+    return db.query(Message).filter(Message.session_id == s.id).order_by(Message.created_at, Message.id).all()
+
+
+def _contents(r) -> list[str]:
+    return [m["content"] for m in r.json()["messages"]]
+
+
+def test_after_id_returns_only_newer_messages(client, db, make_session):
+    s = make_session(5)
+    anchor = _messages(db, s)[2]
+    r = client.get(f"/session/{s.id}", params={"after_id": str(anchor.id)})
+    assert r.status_code == 200
+    assert r.json()["delta"] is True
+    assert "documents" not in r.json()
+    assert _contents(r) == ["message 3", "message 4"]
+
+
+def test_unknown_after_id_is_a_404(client, make_session):
+    s = make_session(3)
+    r = client.get(f"/session/{s.id}", params={"after_id": str(uuid4())})
+    assert r.status_code == 404
+    assert r.json()["detail"] == "Message not found"
+
+
+def test_after_id_from_another_session_is_a_404(client, db, make_session):
+    s, other = make_session(3), make_session(3)
+    r = client.get(f"/session/{s.id}", params={"after_id": str(_messages(db, other)[0].id)})
+    assert r.status_code == 404
+
+
+@pytest.mark.parametrize("offset", [timedelta(0), timedelta(hours=2), timedelta(hours=-5, minutes=-30)])
+def test_since_with_a_timezone_offset_is_compared_in_utc(client, db, make_session, offset):
+    s = make_session(5)
+    anchor = _messages(db, s)[2].created_at   # stored as naive UTC
+    since = anchor.replace(tzinfo=timezone.utc).astimezone(timezone(offset)).isoformat()
+    r = client.get(f"/session/{s.id}", params={"since": since})
+    assert r.status_code == 200
+    assert _contents(r) == ["message 3", "message 4"]
+
+
+def test_naive_since_is_taken_as_utc(client, db, make_session):
+    s = make_session(5)
+    r = client.get(f"/session/{s.id}", params={"since": _messages(db, s)[2].created_at.isoformat()})
+    assert _contents(r) == ["message 3", "message 4"]
+
+
+def test_delta_is_revalidated_by_the_session_etag(client, db, make_session):
+    s = make_session(4, name="Named")
+    params = {"after_id": str(_messages(db, s)[-1].id)}
+    first = client.get(f"/session/{s.id}", params=params)
+    etag = first.headers["ETag"]
+    assert (first.status_code, _contents(first), etag) == (200, [], f'"s{first.json()["version"]}"')
+    assert etag == client.get(f"/session/{s.id}").headers["ETag"]   # same tag as the full payload
+
+    unchanged = client.get(f"/session/{s.id}", params=params, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["ETag"] == etag
+
+    assert client.post(f"/session/{s.id}/message", data={"text": "new question"}).status_code == 200
+    changed = client.get(f"/session/{s.id}", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert _contents(changed) == ["new question", "fake reply"]
@@ -0,0 +1,36 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from backend.routers.sessions import _decode_cursor, _encode_cursor, _etag_matches
+
+
+def test_cursor_round_trip():
+    created_at, sid = datetime(2025, 3, 1, 12, 30, 45, 123456), uuid4()
+    cursor = _encode_cursor(created_at, sid)
+    assert "=" not in cursor.rstrip("=")  # url-safe alphabet
+    assert _decode_cursor(cursor) == (created_at, sid)
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "aGVsbG8=", _encode_cursor(datetime(2025, 1, 1), uuid4())[:-4]])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        _decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"s3"', True),
+    ('W/"s3"', True),
+    ('"s2", "s3"', True),
+    ('"s2",W/"s3"', True),
+    ("*", True),
+    ('"s4"', False),
+    ("s3", False),
+])
+def test_etag_matches(header, expected):
+    assert _etag_matches(header, '"s3"') is expected
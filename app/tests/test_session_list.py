@@ -0,0 +1,53 @@
+import pytest
+
+pytestmark = pytest.mark.usefixtures("fake_model")
+
+
+def _page(client, etag=None, **params):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get("/session/list", params={"lean": "true", "limit": 2, **params}, headers=headers)
+
+
+def test_lean_page_is_revalidated_by_its_own_rows(client, make_session):
+    oldest, older, newer, newest = (make_session(2, name=f"S{i}") for i in range(4))
+    first = _page(client)
+    second = _page(client, cursor=first.headers["X-Next-Cursor"])
+    assert [r["id"] for r in first.json()] == [str(newest.id), str(newer.id)]
+    assert first.headers["ETag"] != second.headers["ETag"]
+    assert _page(client, first.headers["ETag"]).status_code == 304
+
+    # A write on the second page leaves the first page's tag alone
+    assert client.post(f"/session/{oldest.id}/message", data={"text": "hi"}).status_code == 200
+    assert _page(client, first.headers["ETag"]).status_code == 304
+    assert _page(client, second.headers["ETag"], cursor=first.headers["X-Next-Cursor"]).status_code == 200
+
+    # A write on the page changes it
+    assert client.post(f"/session/{newer.id}/message", data={"text": "hi"}).status_code == 200
+    changed = _page(client, first.headers["ETag"])
+    assert changed.status_code == 200
+    assert changed.json()[1]["message_count"] == 4
+
+
+def test_new_session_changes_the_first_page(client, make_session):
+    make_session()
+    page = _page(client)
+    assert "X-Next-Cursor" not in page.headers
+    assert _page(client, page.headers["ETag"]).status_code == 304
+    make_session()   # still fits the page, but the page now has other rows
+    assert _page(client, page.headers["ETag"]).status_code == 200
+    make_session()   # pushes a row off the page: a next page appears
+    full = _page(client)
+    assert "X-Next-Cursor" in full.headers and full.headers["ETag"] != page.headers["ETag"]
+
+
+def test_pages_of_the_same_rows_differ_by_limit(client, make_session):
+    make_session()
+    assert _page(client).headers["ETag"] != _page(client, limit=3).headers["ETag"]
+
+
+def test_full_list_covers_all_sessions(client, make_session):
+    s = make_session(2, name="Named")
+    etag = client.get("/session/list").headers["ETag"]
+    assert client.get("/session/list", headers={"If-None-Match": etag}).status_code == 304
+    assert client.post(f"/session/{s.id}/message", data={"text": "hi"}).status_code == 200
+    assert client.get("/session/list", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,113 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from backend.database import SessionLocal
+from backend.models import Message, Session as DBSession
+from backend.routers import sessions as sessions_router
+from backend.utils import openai_client
+
+
+def events(client, sid, text="hello") -> list[tuple[str, dict]]:
+    with client.stream("POST", f"/session/{sid}/message/stream", data={"text": text}) as r:
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        body = "".join(r.iter_text())
+    out = []
+    for frame in body.split("\n\n"):
+        if frame:
+            event, data = frame.split("\n")
+            assert event.startswith("event: ") and data.startswith("data: ")
+            out.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return out
+
+
+def test_deltas_then_done(client, make_session, model):
+    model(reply="streamed reply")
+    s = make_session(2, name="Named")
+    received = events(client, s.id)
+    assert [e for e, _ in received] == ["delta", "delta", "done"]
+    assert "".join(d["text"] for e, d in received if e == "delta") == "streamed reply"
+    done = received[-1][1]
+    assert set(done) == {"name", "version", "messages", "context_tokens"}
+    assert [(m["role"], m["content"]) for m in done["messages"]] == [("user", "hello"), ("assistant", "streamed reply")]
+    held = client.get(f"/session/{s.id}").json()
+    assert (held["name"], held["version"]) == ("Named", done["version"])
+    assert held["messages"][-2:] == done["messages"]
+
+
+def test_model_error_ends_with_an_error_event(client, db, make_session, model):
+    model(fail=True)
+    s = make_session(2)
+    received = events(client, s.id)
+    assert [e for e, _ in received] == ["error"]
+    assert "model down" in received[0][1]["detail"]
+    assert db.query(Message).filter(Message.session_id == s.id).count() == 2
+
+
+def test_session_deleted_mid_stream_ends_with_an_error_event(client, make_session, monkeypatch):
+    s = make_session(2, name="Named")
+
+    async def chat_stream(messages):
+        yield "partial"
+        with SessionLocal() as other:
+            other.delete(other.get(DBSession, s.id))
+            other.commit()
+        yield " reply"
+    monkeypatch.setattr(sessions_router, "chat_stream", chat_stream)
+
+    received = events(client, s.id)
+    assert [e for e, _ in received] == ["delta", "delta", "error"]
+    assert received[-1][1]["detail"] == "Session not found"
+    with SessionLocal() as check:
+        assert check.query(Message).filter(Message.session_id == s.id).count() == 0
+
+
+class FakeUpstream:
+    """What chat.completions.create(stream=True) returns: an async iterator of chunks that holds
+    the HTTP response until closed."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def __aiter__(self):
+        for t in self.texts:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))])
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    stream = FakeUpstream(["one ", None, "two ", "three"])
+
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return stream
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(openai_client, "async_client", client)
+    return stream
+
+
+def test_chat_stream_yields_text_and_closes_the_response(upstream):
+    async def read():
+        return [t async for t in openai_client.chat_stream([])]
+    assert asyncio.run(read()) == ["one ", "two ", "three"]
+    assert upstream.closed
+
+
+def test_chat_stream_closes_the_response_when_abandoned(upstream):
+    async def read_one():
+        gen = openai_client.chat_stream([])
+        first = await gen.__anext__()
+        await gen.aclose()   # what happens when the client disconnects mid-reply
+        return first
+    assert asyncio.run(read_one()) == "one "
+    assert upstream.closed
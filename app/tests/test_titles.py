@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.routers import sessions as sessions_router
+from backend.settings import get_settings
+
+
+@pytest.fixture
+def title_wait(monkeypatch):
+    monkeypatch.setattr(get_settings(), "TITLE_WAIT_SECONDS", 0.1)
+
+
+def test_title_is_generated_alongside_the_reply(client, make_session, model, title_wait):
+    model(reply_delay=0.3, title_delay=0.3)
+    s = make_session()
+    start = time.monotonic()
+    body = client.post(f"/session/{s.id}/message", data={"text": "what is mitosis"}).json()
+    assert time.monotonic() - start < 0.55   # not 0.3 + 0.3
+    assert body["name"] == "Fake Title"
+
+
+def test_slow_title_falls_back_to_the_heuristic(client, make_session, model, title_wait):
+    fake = model(title_delay=5)
+    s = make_session()
+    start = time.monotonic()
+    body = client.post(f"/session/{s.id}/message", data={"text": "what is mitosis exactly in cell biology"}).json()
+    assert time.monotonic() - start < 1
+    assert body["name"] == "what is mitosis exactly in cell"
+    assert fake.title_cancelled
+
+
+def test_named_session_makes_no_title_request(client, make_session, model):
+    fake = model()
+    s = make_session(name="Biology")
+    assert client.post(f"/session/{s.id}/message", data={"text": "hi"}).json()["name"] == "Biology"
+    assert fake.title_calls == 0
+
+
+def test_model_error_cancels_the_title_request(client, make_session, model, title_wait):
+    fake = model(title_delay=5, fail=True)
+    s = make_session()
+    assert client.post(f"/session/{s.id}/message", data={"text": "hi"}).status_code == 500
+    assert fake.title_calls == 1 and fake.title_cancelled
+
+
+def test_stream_sets_the_title_with_the_messages(client, make_session, model, title_wait):
+    model(reply_delay=0.05, title_delay=0.05)
+    s = make_session()
+    with client.stream("POST", f"/session/{s.id}/message/stream", data={"text": "photosynthesis"}) as r:
+        body = "".join(r.iter_text())
+    assert "event: done" in body and '"name": "Fake Title"' in body
+    assert client.get(f"/session/{s.id}").json()["name"] == "Fake Title"
+
+
+def test_stream_error_cancels_the_title_request(client, make_session, model, title_wait):
+    fake = model(title_delay=5, fail=True)
+    s = make_session()
+    with client.stream("POST", f"/session/{s.id}/message/stream", data={"text": "hi"}) as r:
+        body = "".join(r.iter_text())
+    assert "event: error" in body
+    assert fake.title_cancelled
+    assert client.get(f"/session/{s.id}").json()["name"] == "Untitled Session"
+
+
+def test_closing_the_block_cancels_the_title_request(model):
+    fake = model(title_delay=5)
+
+    async def run():
+        async def stream():
+            async with sessions_router._title_alongside("Untitled Session", "hello") as task:
+                yield task
+                yield None
+
+        gen = stream()
+        task = await gen.__anext__()
+        await asyncio.sleep(0)   # the title request is under way
+        await gen.aclose()   # what Starlette does when the client goes away
+        await asyncio.sleep(0)
+        return task
+
+    assert asyncio.run(run()).cancelled()
+    assert fake.title_cancelled
@@ -0,0 +1,30 @@
+from backend.utils.tokens import count_tokens, truncate_tokens
+
+
+def test_count_tokens_words_and_punctuation():
+    assert count_tokens("") == 0
+    assert count_tokens(None) == 0
+    assert count_tokens("hello, world!") == 4          # 2 words + 2 punctuation marks
+    assert count_tokens("internationalization") == 4   # 20 ASCII chars at ~6 per token
+
+
+def test_non_ascii_words_cost_more():
+    assert count_tokens("مرحبا") == 2                  # 5 chars at ~3 per token
+    assert count_tokens("مرحبا") > count_tokens("hello")
+
+
+def test_truncate_keeps_the_longest_fitting_prefix():
+    text = "one two three four five"
+    prefix, used = truncate_tokens(text, 3)
+    assert prefix == "one two three"
+    assert used == 3
+    assert truncate_tokens(text, 100) == (text, 5)
+    assert truncate_tokens(text, 0) == ("", 0)
+
+
+def test_truncate_matches_count():
+    text = "Lorem ipsum, dolor sit amet; consectetur adipiscing elit. " * 50
+    for budget in (1, 7, 50, 200):
+        prefix, used = truncate_tokens(text, budget)
+        assert used <= budget
+        assert count_tokens(prefix) == used
@@ -0,0 +1,150 @@
+import array
+import asyncio
+import io
+import json
+import os
+import wave
+from types import SimpleNamespace
+
+import pytest
+
+from backend.settings import get_settings
+from backend.utils import transcribe
+from backend.utils.transcribe import read_wav_segment, transcribe_file, transcribe_stream, wav_segments
+
+RATE = 8000
+
+
+def make_wav(path, seconds: float) -> str:
+    """Mono 16-bit PCM whose samples hold the second they belong to (1, 2, 3, ...)."""
+    frames = array.array("h", (1 + i // RATE for i in range(int(RATE * seconds))))
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(frames.tobytes())
+    return str(path)
+
+
+def _samples(data: bytes) -> array.array:
+    with wave.open(io.BytesIO(data), "rb") as w:
+        return array.array("h", w.readframes(w.getnframes()))
+
+
+def test_segments_cover_the_file_with_a_shorter_last_one(tmp_path):
+    path = make_wav(tmp_path / "a.wav", 2.5)
+    assert wav_segments(path, 1) == [(0, RATE), (RATE, 2 * RATE), (2 * RATE, 2 * RATE + RATE // 2)]
+
+
+def test_file_shorter_than_a_segment_is_one_segment(tmp_path):
+    assert wav_segments(make_wav(tmp_path / "a.wav", 0.5), 1) == [(0, RATE // 2)]
+
+
+def test_empty_wav_has_no_segments(tmp_path):
+    assert wav_segments(make_wav(tmp_path / "a.wav", 0), 1) == []
+
+
+@pytest.mark.parametrize("content", [b"ID3\x04\x00 not a wav at all", b""])
+def test_non_wav_has_no_segments(tmp_path, content):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(content)
+    assert wav_segments(str(path), 1) == []
+
+
+def test_segment_is_a_standalone_wav_of_exactly_its_frames(tmp_path):
+    path = make_wav(tmp_path / "a.wav", 2.5)
+    second = read_wav_segment(path, RATE, 2 * RATE)
+    with wave.open(io.BytesIO(second), "rb") as w:
+        assert (w.getnchannels(), w.getsampwidth(), w.getframerate(), w.getnframes()) == (1, 2, RATE, RATE)
+    assert set(_samples(second)) == {2}
+    last = _samples(read_wav_segment(path, 2 * RATE, 2 * RATE + RATE // 2))
+    assert len(last) == RATE // 2 and set(last) == {3}
+
+
+class FakeTranscriptions:
+    """Names each request by the second its audio starts at; earlier segments answer last."""
+
+    def __init__(self):
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def create(self, model, file, language):
+        name, data = file
+        self.requests.append((name, language))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if not name.endswith(".wav"):
+                return SimpleNamespace(text=" whole file ")
+            second = _samples(data)[0]
+            await asyncio.sleep(0.05 * (5 - second))
+            return SimpleNamespace(text=f" second {second} ")
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def transcriptions(monkeypatch) -> FakeTranscriptions:
+    fake = FakeTranscriptions()
+    monkeypatch.setattr(transcribe, "async_client", SimpleNamespace(audio=SimpleNamespace(transcriptions=fake)))
+    monkeypatch.setattr(transcribe, "_slots", None)   # a semaphore belongs to the loop that first used it
+    monkeypatch.setattr(get_settings(), "TRANSCRIBE_SEGMENT_SECONDS", 1)
+    return fake
+
+
+def _stream(path, filename="voice.wav", lang="en") -> list[str]:
+    async def read():
+        return [part async for part in transcribe_stream(path, filename, lang)]
+    return asyncio.run(read())
+
+
+def test_segments_are_transcribed_concurrently_and_emitted_in_order(tmp_path, transcriptions):
+    path = make_wav(tmp_path / "a.wav", 3.5)
+    assert _stream(path, lang="ar") == ["second 1", "second 2", "second 3", "second 4"]
+    assert sorted(transcriptions.requests) == [(f"part-{i}.wav", "ar") for i in range(4)]
+    assert transcriptions.max_in_flight == 4
+
+
+def test_concurrency_is_capped(tmp_path, transcriptions, monkeypatch):
+    monkeypatch.setattr(get_settings(), "TRANSCRIBE_CONCURRENCY", 2)
+    assert _stream(make_wav(tmp_path / "a.wav", 3.5)) == ["second 1", "second 2", "second 3", "second 4"]
+    assert transcriptions.max_in_flight == 2
+
+
+def test_short_wav_is_sent_whole(tmp_path, transcriptions):
+    assert _stream(make_wav(tmp_path / "a.wav", 0.5)) == ["second 1"]
+    assert transcriptions.requests == [("voice.wav", "en")]
+
+
+def test_other_formats_are_sent_whole_under_their_own_name(tmp_path, transcriptions):
+    path = tmp_path / "note.m4a"
+    path.write_bytes(b"\x00\x00\x00\x18ftypM4A ")
+    assert _stream(str(path), filename="note.m4a") == ["whole file"]
+    assert transcriptions.requests == [("note.m4a", "en")]
+
+
+def test_transcribe_file_joins_the_parts(tmp_path, transcriptions):
+    path = make_wav(tmp_path / "a.wav", 2.5)
+    assert asyncio.run(transcribe_file(path, "voice.wav", "en")) == "second 1 second 2 second 3"
+
+
+def test_stream_route_emits_partials_in_order_then_done(client, make_session, tmp_path, transcriptions, monkeypatch):
+    upload_dir = tmp_path / "uploads"
+    monkeypatch.setattr(get_settings(), "UPLOAD_DIR", str(upload_dir))
+    s = make_session()
+    make_wav(tmp_path / "a.wav", 2.5)
+    wav = (tmp_path / "a.wav").read_bytes()
+    with client.stream("POST", f"/session/{s.id}/transcribe/stream",
+                       files={"file": ("voice.wav", wav)}, data={"lang": "fr"}) as r:
+        assert r.status_code == 200
+        body = "".join(r.iter_text())
+    frames = [frame.split("\n") for frame in body.split("\n\n") if frame]
+    received = [(event[len("event: "):], json.loads(data[len("data: "):])) for event, data in frames]
+    assert received == [
+        ("partial", {"index": 0, "text": "second 1"}),
+        ("partial", {"index": 1, "text": "second 2"}),
+        ("partial", {"index": 2, "text": "second 3"}),
+        ("done", {"transcription": "second 1 second 2 second 3"}),
+    ]
+    assert {lang for _, lang in transcriptions.requests} == {"fr"}
+    assert os.listdir(upload_dir) == []   # the received audio is removed once transcribed
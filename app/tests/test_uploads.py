@@ -0,0 +1,141 @@
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from backend import ingest
+from backend.models import Document
+from backend.settings import get_settings
+from backend.utils.uploads import MULTIPART_OVERHEAD, UploadSizeLimitMiddleware, receive_form
+
+LIMIT = 100 * 1024
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", LIMIT)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_BYTES", 16 * 1024)
+    return tmp_path
+
+
+@pytest.fixture
+def probe(upload_dir):
+    """A bare app reading its form with receive_form, behind the size-limit middleware."""
+    app = FastAPI()
+    app.state.calls = 0
+
+    def path_for(filename: str) -> str:
+        if filename.endswith(".exe"):
+            raise HTTPException(status_code=400, detail="Unsupported file type")
+        return str(upload_dir / filename)
+
+    @app.post("/s/upload")
+    @app.post("/s/message")
+    async def upload(request: Request):
+        app.state.calls += 1
+        form = await receive_form(request, path_for, LIMIT)
+        return {"fields": form.fields, "file": form.file and vars(form.file)}
+
+    app.add_middleware(UploadSizeLimitMiddleware)
+    client = TestClient(app)
+    client.calls = lambda: app.state.calls
+    return client
+
+
+def test_file_is_written_once_to_its_path_and_hashed(probe, upload_dir):
+    data = os.urandom(LIMIT)
+    r = probe.post("/s/upload", files={"file": ("notes.txt", data)}, data={"text": "hello"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["fields"] == {"text": "hello"}
+    assert body["file"] == {"filename": "notes.txt", "path": str(upload_dir / "notes.txt"),
+                            "sha256": hashlib.sha256(data).hexdigest(), "size": LIMIT}
+    assert os.listdir(upload_dir) == ["notes.txt"]
+    assert (upload_dir / "notes.txt").read_bytes() == data
+
+
+def test_client_path_components_are_dropped(probe, upload_dir):
+    r = probe.post("/s/upload", files={"file": ("../../etc/notes.txt", b"x")})
+    assert r.json()["file"]["path"] == str(upload_dir / "notes.txt")
+
+
+def test_declared_oversized_body_is_refused_before_it_is_read(probe, upload_dir):
+    r = probe.post("/s/upload", files={"file": ("big.txt", b"x" * (LIMIT + MULTIPART_OVERHEAD + 1))})
+    assert r.status_code == 413
+    assert r.json()["detail"] == f"File is larger than {LIMIT // (1024 * 1024)} MB"
+    assert probe.calls() == 0
+    assert os.listdir(upload_dir) == []
+
+
+def test_undeclared_oversized_body_is_refused_as_it_arrives(probe, upload_dir):
+    boundary = "b0undary"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.txt\"\r\n"
+            "Content-Type: text/plain\r\n\r\n").encode()
+
+    def body():   # no Content-Length: sent chunked
+        yield head
+        for _ in range(4 * LIMIT // 1024):
+            yield b"x" * 1024
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    r = probe.post("/s/upload", content=body(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert r.status_code == 413
+    assert probe.calls() == 1   # got past the middleware
+    assert os.listdir(upload_dir) == []   # the partial file is removed
+
+
+def test_file_within_the_limit_but_near_it_passes_the_middleware(probe):
+    r = probe.post("/s/upload", files={"file": ("notes.txt", b"x" * LIMIT)})
+    assert r.status_code == 200 and r.json()["file"]["size"] == LIMIT
+
+
+def test_other_routes_are_not_limited(probe):
+    r = probe.post("/s/message", data={"text": "x" * (LIMIT + MULTIPART_OVERHEAD + 1)})
+    assert r.status_code == 200
+    assert probe.calls() == 1
+
+
+def test_refused_file_type_writes_nothing(probe, upload_dir):
+    r = probe.post("/s/upload", files={"file": ("tool.exe", b"MZ")})
+    assert r.status_code == 400
+    assert os.listdir(upload_dir) == []
+
+
+def test_urlencoded_form_is_read_as_fields(probe):
+    r = probe.post("/s/upload", data={"text": "just text"})
+    assert r.json() == {"fields": {"text": "just text"}, "file": None}
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest, "submit", lambda document_id, path, filename, sha256: calls.append((document_id, path, sha256)))
+    return calls
+
+
+def test_upload_route_queues_the_received_file(client, db, make_session, upload_dir, submitted):
+    s = make_session()
+    r = client.post(f"/session/{s.id}/upload", files={"file": ("notes.txt", b"some notes")})
+    assert r.status_code == 202
+    d = db.get(Document, r.json()["document_id"])
+    path = ingest.upload_path(d.id, "notes.txt")
+    assert submitted == [(d.id, path, hashlib.sha256(b"some notes").hexdigest())]
+    assert os.listdir(upload_dir) == [os.path.basename(path)]
+
+
+def test_upload_route_refuses_oversized_chunked_body(client, db, make_session, upload_dir, submitted):
+    s = make_session()
+
+    def body():
+        yield b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.txt\"\r\n\r\n"
+        yield b"x" * (LIMIT + 1)
+        yield b"\r\n--b--\r\n"
+
+    r = client.post(f"/session/{s.id}/upload", content=body(), headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert r.status_code == 413
+    assert submitted == [] and os.listdir(upload_dir) == []
+    assert db.query(Document).filter(Document.session_id == s.id).count() == 0
@@ -0,0 +1,34 @@
+import pytest
+
+pytestmark = pytest.mark.usefixtures("fake_model")
+
+
+def test_message_returns_only_the_new_turn(client, make_session):
+    s = make_session(10)
+    version = client.get(f"/session/{s.id}").json()["version"]
+    body = client.post(f"/session/{s.id}/message", data={"text": "hello"}).json()
+    assert set(body) == {"reply", "context_tokens", "name", "version", "messages"}
+    assert [(m["role"], m["content"]) for m in body["messages"]] == [("user", "hello"), ("assistant", "fake reply")]
+    assert all(m["id"] and m["created_at"] for m in body["messages"])
+    assert body["name"] == "Fake Title"
+    assert body["version"] > version
+    # The response is enough to bring a held copy up to date
+    full = client.get(f"/session/{s.id}").json()
+    assert full["version"] == body["version"]
+    assert full["messages"][-2:] == body["messages"]
+
+
+def test_full_flag_adds_the_session(client, make_session):
+    s = make_session(4, name="Named")
+    body = client.post(f"/session/{s.id}/message", params={"full": "true"}, data={"text": "hi"}).json()
+    assert body["session"]["version"] == body["version"]
+    assert len(body["session"]["messages"]) == 6
+    assert body["session"]["messages"][-2:] == body["messages"]
+    assert body["name"] == "Named"
+
+
+def test_action_returns_only_the_new_turn(client, make_session):
+    s = make_session(4, name="Named")
+    body = client.post(f"/session/{s.id}/generate/flashcards", data={"text": "cells"}).json()
+    assert set(body) == {"reply", "cached", "context_tokens", "name", "version", "messages"}
+    assert [m["type"] for m in body["messages"]] == ["flashcards", "flashcards"]